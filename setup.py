@@ -24,6 +24,12 @@ setup(
         "requests",
         "httpx",
     ],
+    extras_require={
+        "brotli": ["brotli"],
+        "http2": ["h2"],
+        "opentelemetry": ["opentelemetry-api"],
+        "history": ["numpy"],
+    },
     project_urls={
         'Bug Reports': 'https://github.com/yellowfluf/YellowChangerAPI/issues',
         'Source': 'https://github.com/yellowfluf/YellowChangerAPI/tree/main',
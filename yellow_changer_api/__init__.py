@@ -1,2 +1,8 @@
 from .yellow_changer import YellowChanger # noqa
 from .yellow_changer import AsyncYellowChanger # noqa
+from .loop_client import LoopYellowChanger # noqa
+from .pool import YellowChangerPool # noqa
+from .hedging import HedgePolicy # noqa
+from .preflight import PreflightValidator # noqa
+from .scheduling import Priority, use_priority # noqa
+from .history import RateHistory # noqa
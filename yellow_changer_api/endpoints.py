@@ -0,0 +1,194 @@
+import threading
+import time
+from typing import Iterable, List, Optional, Union
+
+
+DEFAULT_BASE_URL = "https://api.yellowchanger.com/"
+
+# HTTP statuses which mean a problem of the endpoint, not of the request
+_ENDPOINT_FAILURE_STATUSES = {429}
+
+
+def is_endpoint_failure(status_code: Optional[int]) -> bool:
+    """
+    Whether the response should count against health of the endpoint.
+
+    Transport errors (no status), 5xx and 429 do,
+    other statuses are answers to the request itself.
+    """
+    return (
+        status_code is None
+        or status_code >= 500
+        or status_code in _ENDPOINT_FAILURE_STATUSES
+    )
+
+
+def normalize_base_urls(base_url: Union[None, str, Iterable[str]]) -> List[str]:
+    """
+    :param base_url: BaseURL, list of BaseURLs or None for the default one
+    :return: List of BaseURLs ending with a slash
+    :raises ValueError: If the list of BaseURLs is empty.
+    """
+    if base_url is None or isinstance(base_url, str):
+        urls = [base_url or DEFAULT_BASE_URL]
+    else:
+        urls = list(base_url)
+    if not urls:
+        raise ValueError("base_url must not be empty")
+    return [url if url.endswith("/") else url + "/" for url in urls]
+
+
+class Endpoint:
+    def __init__(self, base_url: str):
+        """
+        BaseURL of the API with its observed latency and error rate.
+
+        :param base_url: BaseURL ending with a slash
+        """
+        self.base_url = base_url
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.last_used = 0.0
+
+    def healthy(self, now: Optional[float] = None) -> bool:
+        return (now or time.monotonic()) >= self.unhealthy_until
+
+    def stats(self) -> dict:
+        return {
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "requests": self.requests,
+            "failures": self.failures,
+            "healthy": self.healthy(),
+        }
+
+
+class EndpointSelector:
+    def __init__(
+        self,
+        base_urls: Union[None, str, Iterable[str]] = None,
+        alpha: float = 0.2,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        probe_interval: float = 60.0,
+        max_error_rate: float = 0.25
+    ):
+        """
+        Routes requests to the fastest healthy BaseURL.
+
+        Latency of successful requests and error rate of every endpoint are
+        tracked as EWMA, endpoints are ranked by latency / (1 - error_rate),
+        endpoints with error rate above max_error_rate after the others, so an
+        endpoint which fails fast doesn't look fast. An endpoint is
+        skipped for cooldown seconds after failure_threshold consecutive failures.
+        Endpoints which were not used for probe_interval seconds are ranked
+        first once, so a recovered endpoint gets traffic back.
+
+        :param base_urls: BaseURL or list of BaseURLs, the first one is preferred on ties
+        :param alpha: Weight of the latest sample in EWMA
+        :param failure_threshold: Consecutive failures after which the endpoint is skipped
+        :param cooldown: Seconds the unhealthy endpoint is skipped for
+        :param probe_interval: Seconds after which an unused endpoint is measured again
+        :param max_error_rate: Error rate above which the endpoint is ranked after the others
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be between 0 and 1")
+        self.endpoints = [Endpoint(url) for url in normalize_base_urls(base_urls)]
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_interval = probe_interval
+        self.max_error_rate = max_error_rate
+        # The synchronous client records results from many threads
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> str:
+        return self.endpoints[0].base_url
+
+    def __rank(self, endpoint: Endpoint, now: float) -> tuple:
+        unhealthy = not endpoint.healthy(now)
+        # An endpoint not used for a while is probed first, so a degraded one may recover
+        if now - endpoint.last_used >= self.probe_interval:
+            return unhealthy, False, 0.0
+        degraded = endpoint.error_rate > self.max_error_rate
+        if endpoint.latency is None:
+            return unhealthy, degraded, 0.0
+        return unhealthy, degraded, endpoint.latency / max(1.0 - endpoint.error_rate, 0.01)
+
+    def ranked(self, exclude: Iterable[Endpoint] = ()) -> List[Endpoint]:
+        """
+        Endpoints from the best to the worst, degraded and unhealthy ones last.
+
+        :param exclude: Endpoints already tried by the call
+        :return: List of Endpoint
+        """
+        now = time.monotonic()
+        exclude = set(exclude)
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+            # sorted() is stable, so the order of base_urls breaks ties
+            return sorted(candidates, key=lambda endpoint: self.__rank(endpoint, now))
+
+    def select(self, exclude: Iterable[Endpoint] = ()) -> Endpoint:
+        """
+        The best endpoint not yet tried by the call.
+
+        If every endpoint was tried, the best of all is returned.
+
+        :param exclude: Endpoints already tried by the call
+        :return: Endpoint
+        """
+        ranked = self.ranked(exclude) or self.ranked()
+        endpoint = ranked[0]
+        endpoint.last_used = time.monotonic()
+        return endpoint
+
+    def has_alternative(self, exclude: Iterable[Endpoint]) -> bool:
+        """
+        Whether a healthy endpoint was not yet tried by the call.
+
+        If every endpoint is unhealthy, any endpoint not yet tried counts,
+        trying it is better than failing outright.
+        """
+        now = time.monotonic()
+        exclude = set(exclude)
+        untried = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+        if not any(endpoint.healthy(now) for endpoint in self.endpoints):
+            return bool(untried)
+        return any(endpoint.healthy(now) for endpoint in untried)
+
+    def record(self, endpoint: Endpoint, latency: float, failed: bool):
+        """
+        Update EWMA of the endpoint with the result of a request.
+
+        :param endpoint: Endpoint returned by select()
+        :param latency: Seconds until the response or the error
+        :param failed: Whether the request failed because of the endpoint,
+            latency of a failure is not counted, failing fast doesn't make the endpoint fast
+        """
+        with self._lock:
+            endpoint.requests += 1
+            if not failed and endpoint.latency is None:
+                endpoint.latency = latency
+            elif not failed:
+                endpoint.latency += self.alpha * (latency - endpoint.latency)
+            endpoint.error_rate += self.alpha * (float(failed) - endpoint.error_rate)
+            endpoint.last_used = time.monotonic()
+            if not failed:
+                endpoint.consecutive_failures = 0
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.failure_threshold:
+                endpoint.unhealthy_until = time.monotonic() + self.cooldown
+
+    def stats(self) -> dict:
+        """
+        :return: Dictionary of latency and health stats per BaseURL
+        """
+        return {endpoint.base_url: endpoint.stats() for endpoint in self.endpoints}
@@ -1,8 +1,13 @@
+from typing import Optional
+
+
 class BadRequest(Exception):
     """Exception raised for invalid requests."""
 
-    def __init__(self, message: str = "Bad request"):
+    def __init__(self, message: str = "Bad request", status_code: Optional[int] = None):
         self.message = message
+        # HTTP status of the response, None if there was no response
+        self.status_code = status_code
         super().__init__(self.message)
 
 
@@ -20,3 +25,35 @@ class UnsupportedMemo(Exception):
     def __init__(self, message: str = "Memo is not supported for this coin"):
         self.message = message
         super().__init__(self.message)
+
+
+class DeadlineExceeded(BadRequest):
+    """Exception raised if the call didn't finish before its deadline."""
+
+    def __init__(self, message: str = "Deadline exceeded", status_code: Optional[int] = None):
+        # status_code is the status of the last failed attempt, if any
+        super().__init__(message, status_code)
+
+
+class UnsupportedDirection(Exception):
+    """Exception raised if the exchange direction is not supported."""
+
+    def __init__(self, message: str = "Exchange direction is not supported"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class AmountOutOfRange(Exception):
+    """Exception raised if the amount is out of limits of the direction."""
+
+    def __init__(self, message: str = "Amount is out of range"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class UnknownTrade(Exception):
+    """Exception raised if the pool doesn't know which API key created the trade."""
+
+    def __init__(self, message: str = "Trade was not created by this pool"):
+        self.message = message
+        super().__init__(self.message)
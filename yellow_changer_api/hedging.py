@@ -0,0 +1,159 @@
+import asyncio
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional
+
+
+# Start of the current attempt of a hedged request, moved by mark_attempt(),
+# so retries and delays between them are not sampled as latency
+_attempt_started: ContextVar = ContextVar("hedge_attempt_started", default=None)
+
+
+def mark_attempt():
+    """
+    Mark the start of a request attempt, called by the HTTP client.
+
+    Does nothing outside of a hedged request.
+    """
+    started = _attempt_started.get()
+    if started is not None:
+        started[0] = time.monotonic()
+
+
+class HedgePolicy:
+    def __init__(
+        self,
+        delay: Optional[float] = None,
+        percentile: float = 0.95,
+        default_delay: float = 1.0,
+        min_samples: int = 20,
+        window: int = 1000,
+        budget: float = 0.1,
+        max_tokens: float = 10.0
+    ):
+        """
+        Policy for hedged requests of idempotent GET endpoints.
+
+        If the first request hasn't answered within the hedge delay, a second
+        identical request is sent, the first answer wins and the other one
+        is cancelled.
+
+        :param delay: Fixed hedge delay in seconds. If None, the observed
+            latency percentile is used.
+        :param percentile: Latency percentile used as hedge delay (default p95).
+        :param default_delay: Hedge delay until min_samples latencies are observed.
+        :param min_samples: Minimum number of samples to trust the percentile.
+        :param window: Number of latest latencies kept for the percentile.
+        :param budget: Share of requests which may be hedged, 0.1 means
+            at most ~10% extra load.
+        :param max_tokens: Maximum number of hedges which may be accumulated
+            in the budget during quiet periods.
+        """
+        if not 0 < percentile < 1:
+            raise ValueError("percentile must be between 0 and 1")
+        if budget < 0:
+            raise ValueError("budget must not be negative")
+        self.delay = delay
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.budget = budget
+        self.max_tokens = max_tokens
+        self._latencies = deque(maxlen=window)
+        self._tokens = max_tokens
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+        self.budget_exhausted = 0
+
+    def hedge_delay(self) -> float:
+        """
+        Current delay before the hedge request is sent.
+
+        :return: Delay in seconds
+        """
+        if self.delay is not None:
+            return self.delay
+        if len(self._latencies) < self.min_samples:
+            return self.default_delay
+        samples = sorted(self._latencies)
+        index = min(len(samples) - 1, int(len(samples) * self.percentile))
+        return samples[index]
+
+    def stats(self) -> dict:
+        """
+        Hedging metrics.
+
+        :return: Dictionary with counters and the current hedge delay
+        """
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "primary_wins": self.primary_wins,
+            "budget_exhausted": self.budget_exhausted,
+            "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+            "hedge_win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0,
+            "hedge_delay": self.hedge_delay(),
+        }
+
+    def _try_spend(self) -> bool:
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        self.budget_exhausted += 1
+        return False
+
+    async def _timed(self, request: Callable[[], Awaitable]):
+        # Every task has its own context, so the attempts of hedged requests don't mix
+        started = [time.monotonic()]
+        _attempt_started.set(started)
+        try:
+            result = await request()
+        except asyncio.CancelledError:
+            # The attempt lost the race, its latency is at least the elapsed time.
+            # Without the sample the slow tail is never observed and the delay shrinks.
+            self._latencies.append(time.monotonic() - started[0])
+            raise
+        self._latencies.append(time.monotonic() - started[0])
+        return result
+
+    async def run(self, request: Callable[[], Awaitable]):
+        """
+        Execute request with hedging.
+
+        :param request: Factory of the request coroutine, called once per attempt.
+        :return: Result of the first successful request
+        :raises Exception: Error of the primary request if every request failed.
+        """
+        self.requests += 1
+        self._tokens = min(self.max_tokens, self._tokens + self.budget)
+
+        primary = asyncio.ensure_future(self._timed(request))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+            if done or not self._try_spend():
+                return await primary
+
+            self.hedged += 1
+            hedge = asyncio.ensure_future(self._timed(request))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        else:
+                            self.primary_wins += 1
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
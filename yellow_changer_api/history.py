@@ -0,0 +1,347 @@
+import json
+import math
+import os
+import struct
+import time
+from typing import Iterator, Optional, Tuple, Union
+
+try:
+    import numpy as np
+    NUMPY_INSTALLED = True
+except ImportError:
+    NUMPY_INSTALLED = False
+
+
+# Column files of the history directory: (file name, numpy dtype, struct format),
+# values are fixed-width little-endian
+_TIMESTAMPS = ("timestamps.f8", "<f8", "<d")
+_PAIR_IDS = ("pairs.u4", "<u4", "<I")
+_RATES = ("rates.f8", "<f8", "<d")
+_COLUMNS = (_TIMESTAMPS, _PAIR_IDS, _RATES)
+# Interned pair names, one JSON string per line, line number is the pair ID
+_NAMES = "pairs.jsonl"
+# Rows in the first block of a backward search, every next block is twice larger
+_SEARCH_BLOCK = 4096
+
+
+def _require_numpy():
+    if not NUMPY_INSTALLED:
+        raise ImportError(
+            "numpy is required to query rate history: pip install yellowchangerapi[history]"
+        )
+
+
+def flatten_rates(snapshot, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    """
+    Numeric leaves of an allRates snapshot.
+
+    Nested fields are named by their path, e.g. "USDT_TRC20.BTC.rate",
+    values which are not numbers are skipped.
+
+    :param snapshot: Response of all_rates() or iterable of (pair, rate),
+        e.g. iter_all_rates()
+    :param prefix: Prefix of the names
+    :return: Iterator of (name, rate)
+    """
+    if isinstance(snapshot, dict):
+        items = snapshot.items()
+    elif isinstance(snapshot, list) and prefix:
+        items = enumerate(snapshot)
+    else:
+        items = snapshot
+    for key, value in items:
+        name = f"{prefix}{key}"
+        if isinstance(value, (dict, list)):
+            yield from flatten_rates(value, name + ".")
+            continue
+        if value is None or isinstance(value, bool):
+            continue
+        try:
+            yield name, float(value)
+        except (TypeError, ValueError):
+            continue
+
+
+class RateHistory:
+    def __init__(self, path: str, only_changed: bool = True, readonly: bool = False):
+        """
+        Append-only columnar archive of allRates snapshots.
+
+        Every row is (timestamp, pair ID, rate), each column is a file of
+        fixed-width little-endian values in the directory, so the archive is
+        queried through numpy.memmap without reading or copying it.
+        Pair names are interned to uint32 IDs.
+
+        Recording needs no extra packages, queries require numpy.
+
+        :param path: Directory of the archive, created if missing
+        :param only_changed: Append only pairs whose rate changed since
+            the previous snapshot recorded by this object
+        :param readonly: Only query the archive, e.g. while another process records it
+        """
+        self.path = path
+        self.only_changed = only_changed
+        self.readonly = readonly
+        self._names = []
+        self._ids = {}
+        self._last_rates = {}
+        self._files = []
+        self._names_file = None
+        if not readonly:
+            os.makedirs(path, exist_ok=True)
+            self.__repair()
+            self._files = [open(self.__file(name), "ab") for name, _, _ in _COLUMNS]
+            self._names_file = open(self.__file(_NAMES), "a", encoding="utf-8")
+        self.__load_names()
+        self._last_timestamp = self.__read_last_timestamp()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """
+        Close column files when exiting context.
+        """
+        self.close()
+
+    def close(self):
+        """
+        Close column files.
+        """
+        for file in self._files:
+            file.close()
+        if self._names_file is not None:
+            self._names_file.close()
+
+    def __file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def __load_names(self):
+        """
+        Read pair names interned by other writers since the last load.
+        """
+        try:
+            with open(self.__file(_NAMES), encoding="utf-8") as file:
+                # A line without newline is still being written
+                lines = file.read().split("\n")[:-1]
+        except FileNotFoundError:
+            return
+        for line in lines[len(self._names):]:
+            name = json.loads(line)
+            self._ids[name] = len(self._names)
+            self._names.append(name)
+
+    def __rows_on_disk(self) -> int:
+        rows = []
+        for name, _, code in _COLUMNS:
+            try:
+                size = os.path.getsize(self.__file(name))
+            except FileNotFoundError:
+                size = 0
+            rows.append(size // struct.calcsize(code))
+        return min(rows)
+
+    def __repair(self):
+        """
+        Cut a row or a pair name which was not completely written, e.g. after a crash.
+        """
+        rows = self.__rows_on_disk()
+        for name, _, code in _COLUMNS:
+            file_name = self.__file(name)
+            size = rows * struct.calcsize(code)
+            if not os.path.exists(file_name):
+                open(file_name, "wb").close()
+            elif os.path.getsize(file_name) != size:
+                os.truncate(file_name, size)
+        names_file = self.__file(_NAMES)
+        if os.path.exists(names_file):
+            with open(names_file, "rb") as file:
+                size = file.read().rfind(b"\n") + 1
+            os.truncate(names_file, size)
+
+    def __read_last_timestamp(self) -> float:
+        rows = self.__rows_on_disk()
+        if not rows:
+            return -math.inf
+        name, _, code = _TIMESTAMPS
+        size = struct.calcsize(code)
+        with open(self.__file(name), "rb") as file:
+            file.seek((rows - 1) * size)
+            return struct.unpack(code, file.read(size))[0]
+
+    def __intern(self, name: str) -> int:
+        pair_id = self._ids.get(name)
+        if pair_id is None:
+            pair_id = len(self._names)
+            # The name is stored before any row refers to it
+            self._names_file.write(json.dumps(name) + "\n")
+            self._names_file.flush()
+            self._ids[name] = pair_id
+            self._names.append(name)
+        return pair_id
+
+    def record(self, snapshot, timestamp: Optional[float] = None) -> int:
+        """
+        Append a snapshot of rates.
+
+        :param snapshot: Response of all_rates() or iterable of (pair, rate),
+            e.g. iter_all_rates(), see flatten_rates
+        :param timestamp: Unix time of the snapshot, now by default
+        :return: Number of appended rows
+        :raises ValueError: If timestamp is earlier than the last recorded one.
+        """
+        if self.readonly:
+            raise ValueError("RateHistory is opened read-only")
+        if timestamp is None:
+            timestamp = time.time()
+        if timestamp < self._last_timestamp:
+            raise ValueError("timestamp must not be earlier than the last recorded one")
+
+        pair_ids = []
+        rates = []
+        for name, rate in flatten_rates(snapshot):
+            pair_id = self.__intern(name)
+            if self.only_changed and self._last_rates.get(pair_id) == rate:
+                continue
+            self._last_rates[pair_id] = rate
+            pair_ids.append(pair_id)
+            rates.append(rate)
+        if not rates:
+            return 0
+
+        count = len(rates)
+        for file, values, (_, _, code) in zip(
+            self._files,
+            ([timestamp] * count, pair_ids, rates),
+            _COLUMNS
+        ):
+            file.write(struct.pack(f"<{count}{code[1:]}", *values))
+            file.flush()
+        self._last_timestamp = timestamp
+        return count
+
+    def __len__(self) -> int:
+        return self.__rows_on_disk()
+
+    def pairs(self) -> list:
+        """
+        :return: Names of every recorded pair, index is the pair ID
+        """
+        self.__load_names()
+        return list(self._names)
+
+    def pair_id(self, pair: str) -> Optional[int]:
+        """
+        :param pair: Name of the pair, see flatten_rates
+        :return: Interned ID of the pair or None if it was never recorded
+        """
+        if pair not in self._ids:
+            self.__load_names()
+        return self._ids.get(pair)
+
+    def columns(self) -> tuple:
+        """
+        Memory-mapped columns of the archive, nothing is read or copied.
+
+        :return: Tuple of numpy arrays (timestamps, pair_ids, rates)
+        """
+        _require_numpy()
+        rows = len(self)
+        return tuple(
+            np.memmap(self.__file(name), dtype=dtype, mode="r", shape=(rows,))
+            if rows else np.empty(0, dtype=dtype)
+            for name, dtype, _ in _COLUMNS
+        )
+
+    def series(
+        self,
+        pair: str,
+        start: Union[float, None] = None,
+        end: Union[float, None] = None
+    ) -> tuple:
+        """
+        Rates of a pair between start and end, inclusive.
+
+        Rows are sorted by timestamp, so the time range is found by binary
+        search and only rows inside it are scanned.
+        With only_changed the series holds the moments of change and starts
+        with the last row before start, i.e. the rate in effect at start,
+        it is searched backward from start.
+
+        :param pair: Name of the pair, see flatten_rates
+        :param start: Unix time of the first snapshot, from the beginning by default
+        :param end: Unix time of the last snapshot, until the end by default
+        :return: Tuple of numpy arrays (timestamps, rates)
+        """
+        timestamps, pair_ids, rates = self.columns()
+        pair_id = self.pair_id(pair)
+        if pair_id is None:
+            return np.empty(0, dtype=_TIMESTAMPS[1]), np.empty(0, dtype=_RATES[1])
+        low, high = self.__bounds(timestamps, start, end)
+        rows = low + np.flatnonzero(pair_ids[low:high] == pair_id)
+        if (
+            self.only_changed
+            and start is not None
+            and (not len(rows) or timestamps[rows[0]] > start)
+        ):
+            previous = self.__last_row(pair_ids, pair_id, low)
+            if previous is not None:
+                rows = np.concatenate(([previous], rows))
+        return np.asarray(timestamps[rows]), np.asarray(rates[rows])
+
+    def rates_at(self, timestamp: Union[float, None] = None) -> dict:
+        """
+        Last known rate of every pair at the moment.
+
+        Rows are searched backward from the moment until every known pair
+        is found, so only the tail of the archive is read if every pair
+        changes often.
+
+        :param timestamp: Unix time, the end of the archive by default
+        :return: Dictionary of rates keyed by pair name
+        """
+        timestamps, pair_ids, rates = self.columns()
+        names = self.pairs()
+        _, high = self.__bounds(timestamps, None, timestamp)
+        last_rates = {}
+        for low, high in self.__blocks_before(high):
+            if len(last_rates) == len(names):
+                break
+            # The last occurrence of a pair is the first one in reversed rows
+            unique_ids, positions = np.unique(pair_ids[low:high][::-1], return_index=True)
+            block_rates = rates[low:high][::-1][positions]
+            for pair_id, rate in zip(unique_ids.tolist(), block_rates.tolist()):
+                # Rows of later blocks were found first
+                last_rates.setdefault(pair_id, rate)
+        return {names[pair_id]: float(rate) for pair_id, rate in last_rates.items()}
+
+    @classmethod
+    def __last_row(cls, pair_ids, pair_id: int, high: int) -> Optional[int]:
+        """
+        Number of the last row of the pair before high, None if there is none.
+        """
+        for low, block_high in cls.__blocks_before(high):
+            matches = np.flatnonzero(pair_ids[low:block_high] == pair_id)
+            if len(matches):
+                return low + int(matches[-1])
+        return None
+
+    @staticmethod
+    def __blocks_before(high: int) -> Iterator[Tuple[int, int]]:
+        """
+        Ranges of rows from high backward, every block is twice larger than the previous one,
+        so a backward search reads no more than about twice the rows it needed.
+        """
+        size = _SEARCH_BLOCK
+        while high > 0:
+            low = max(0, high - size)
+            yield low, high
+            high = low
+            size *= 2
+
+    @staticmethod
+    def __bounds(timestamps, start: Optional[float], end: Optional[float]) -> Tuple[int, int]:
+        low = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        high = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="right"))
+        return low, high
+
@@ -1,29 +1,67 @@
 import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional, Tuple
+
 import httpx
 from httpx import Timeout, HTTPError
 
+from .endpoints import Endpoint, EndpointSelector, is_endpoint_failure
+from .exceptions import DeadlineExceeded
+from .hedging import mark_attempt
+from .scheduling import Priority, PriorityScheduler
+from .streaming import JSONObjectStream
+from .timeouts import DEFAULT_TIMEOUT, bound_timeout, is_bounded, remaining
+from .tracing import current_span, inject_context, set_attributes, start_span
+
+try:
+    import h2  # noqa: F401
+    H2_INSTALLED = True
+except ImportError:
+    H2_INSTALLED = False
+
 
 class HTTPClient:
 
-    def __init__(self):
+    def __init__(
+        self,
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = False,
+        scheduler: Optional[PriorityScheduler] = None
+    ):
         """
         Initialization of an HTTP client using httpx.AsyncClient.
 
         Creates an asynchronous session for executing HTTP requests.
+
+        :param limits: Connection pool limits, httpx defaults if None.
+        :param http2: Enable HTTP/2, requires h2 package (see H2_INSTALLED).
+        :param scheduler: Optional PriorityScheduler, every attempt waits for its slot.
         """
         self.timeout = Timeout(
-            connect=30.0,  # Connection establishment timeout
-            read=30.0,     # Response reading timeout
-            write=30.0,    # Request sending timeout
-            pool=30.0      # Timeout for obtaining a connection from the pool
+            connect=DEFAULT_TIMEOUT,  # Connection establishment timeout
+            read=DEFAULT_TIMEOUT,     # Response reading timeout
+            write=DEFAULT_TIMEOUT,    # Request sending timeout
+            pool=DEFAULT_TIMEOUT      # Timeout for obtaining a connection from the pool
+        )
+        self.limits = limits or httpx.Limits()
+        self.http2 = http2
+        self.scheduler = scheduler
+        self.session = self._create_session()
+
+    def _create_session(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=self.limits,
+            http2=self.http2
         )
-        self.session = httpx.AsyncClient(timeout=self.timeout)
 
     async def __aenter__(self):
         """
         Initialize session when entering context.
         """
-        self.session = httpx.AsyncClient(timeout=self.timeout)
+        if self.session.is_closed:
+            self.session = self._create_session()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -32,6 +70,320 @@ class HTTPClient:
         """
         await self.session.aclose()
 
+    @asynccontextmanager
+    async def _slot(self, priority: int, deadline: Optional[float]):
+        """
+        Hold a slot of the scheduler, if any, waiting no longer than the deadline.
+        """
+        if self.scheduler is None:
+            yield
+            return
+        # The time left is checked first, so no acquire() coroutine is left unawaited
+        left = remaining(deadline)
+        try:
+            await asyncio.wait_for(self.scheduler.acquire(priority), left)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Deadline exceeded while waiting for a request slot")
+        try:
+            yield
+        finally:
+            self.scheduler.release()
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        json: dict = None,
+        retries: int = 3,
+        base_delay: int = 5,
+        timeout: Timeout = None,
+        deadline: Optional[float] = None,
+        priority: int = Priority.NORMAL,
+        endpoints: Optional[EndpointSelector] = None
+    ):
+        """
+        Execute a request with retry support.
+
+        Every attempt and every delay between attempts ends no later than the deadline.
+        With endpoints every attempt goes to the best BaseURL not yet tried,
+        and after a failure of the endpoint the next one is tried without delay.
+
+        :param method: HTTP method.
+        :param url: URL to execute the request.
+        :param headers: Request headers.
+        :param params: Parameters for the query string.
+        :param json: Request body in JSON format.
+        :param retries: Number of attempts.
+        :param base_delay: Base delay between attempts.
+        :param timeout: Custom timeouts for a single attempt.
+        :param deadline: Deadline of the whole call in time.monotonic() seconds.
+        :param priority: Priority of the request for the scheduler (see Priority).
+        :param endpoints: Optional EndpointSelector, url is a path relative to BaseURL then.
+        :return: Response in JSON format.
+        :raises DeadlineExceeded: If the deadline passed before a successful attempt.
+        :raises httpx.HTTPError: In case of an HTTP error and retries are exhausted.
+        :raises Exception: In case of unexpected errors.
+        """
+        tried = []
+        last_error = None
+        for attempt in range(1, retries + 1):
+            endpoint = None
+            try:
+                async with self._slot(priority, deadline):
+                    bounded = is_bounded(timeout or self.timeout, deadline)
+                    attempt_timeout = bound_timeout(timeout or self.timeout, deadline)
+                    if endpoints is not None:
+                        endpoint = endpoints.select(tried)
+                        tried.append(endpoint)
+                    attempt_url = endpoint.base_url + url if endpoint else url
+                    call_span = current_span()
+                    with start_span(
+                        f"HTTP {method}",
+                        self._attempt_attributes(method, attempt_url, attempt),
+                        client=True
+                    ) as span:
+                        mark_attempt()
+                        started = time.monotonic()
+                        try:
+                            # Timeouts of httpx bound every read, not the whole response
+                            response = await self._within(self.session.request(
+                                method=method,
+                                url=attempt_url,
+                                headers=inject_context(headers),
+                                params=params,
+                                json=json,
+                                timeout=attempt_timeout
+                            ), deadline)
+                        except HTTPError as err:
+                            self._record(endpoints, endpoint, started, None, err, bounded)
+                            raise
+                        self._record(endpoints, endpoint, started, response.status_code)
+                        set_attributes(span, {"http.response.status_code": response.status_code})
+                        if response.is_error:
+                            raise self._status_error(response)
+                        # The caller gets only the body, so the status is set on its span here
+                        set_attributes(call_span, {"http.response.status_code": response.status_code})
+                        return response.json()
+            except DeadlineExceeded as err:
+                raise self._missed_deadline(err, last_error)
+            except Exception as err:
+                last_error = err
+                if self._can_fail_over(err, endpoint, endpoints, tried, attempt, retries):
+                    continue
+                await self._backoff(err, attempt, retries, base_delay, deadline)
+
+    @staticmethod
+    def _missed_deadline(err: DeadlineExceeded, last_error: Optional[Exception]) -> DeadlineExceeded:
+        """
+        Carry the status of the last failed attempt, e.g. 429, on the missed deadline,
+        so the caller still sees why earlier attempts failed.
+        """
+        if err.status_code is None:
+            err.status_code = getattr(last_error, "status_code", None)
+        return err
+
+    @staticmethod
+    async def _within(awaitable, deadline: Optional[float]):
+        """
+        Await no longer than the deadline.
+
+        :raises DeadlineExceeded: If the deadline passed first.
+        """
+        if deadline is None:
+            return await awaitable
+        try:
+            left = remaining(deadline)
+        except DeadlineExceeded:
+            awaitable.close()
+            raise
+        try:
+            return await asyncio.wait_for(awaitable, left)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Deadline exceeded while receiving the response")
+
+    @staticmethod
+    def _attempt_attributes(method: str, url: str, attempt: int) -> dict:
+        return {
+            "http.request.method": method,
+            "url.full": url,
+            "yellowchanger.attempt": attempt,
+        }
+
+    @staticmethod
+    def _record(
+        endpoints: Optional[EndpointSelector],
+        endpoint: Optional[Endpoint],
+        started: float,
+        status_code: Optional[int],
+        err: Optional[Exception] = None,
+        bounded: bool = False
+    ):
+        if endpoint is None:
+            return
+        # The endpoint is not to blame for the timeout shortened by the deadline of the caller
+        if bounded and isinstance(err, httpx.TimeoutException):
+            return
+        endpoints.record(endpoint, time.monotonic() - started, is_endpoint_failure(status_code))
+
+    @staticmethod
+    def _can_fail_over(
+        err: Exception,
+        endpoint: Optional[Endpoint],
+        endpoints: Optional[EndpointSelector],
+        tried: list,
+        attempt: int,
+        retries: int
+    ) -> bool:
+        """
+        Whether the next attempt should go to another endpoint without backoff.
+        """
+        return (
+            endpoint is not None
+            and attempt < retries
+            and is_endpoint_failure(getattr(err, "status_code", None))
+            and endpoints.has_alternative(tried)
+        )
+
+    @staticmethod
+    def _status_error(response: httpx.Response) -> HTTPError:
+        error = HTTPError(response.request)
+        error.status_code = response.status_code
+        error.text = response.text
+        error.reason_phrase = response.reason_phrase
+        return error
+
+    async def _backoff(
+        self,
+        err: Exception,
+        attempt: int,
+        retries: int,
+        base_delay: int,
+        deadline: Optional[float]
+    ):
+        """
+        Sleep before the next attempt or re-raise err if no attempts are left
+        or the next attempt can't start before the deadline.
+        """
+        if attempt == retries:
+            raise err
+        delay = base_delay * attempt
+        # There is no point to sleep if the next attempt can't start in time,
+        # the caller gets the real error (e.g. its status), not a deadline that didn't pass yet
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            raise err
+        with start_span("backoff", {
+            "yellowchanger.attempt": attempt,
+            "yellowchanger.backoff_delay": delay,
+        }):
+            await asyncio.sleep(delay)
+
+    async def stream_items(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        json: dict = None,
+        retries: int = 3,
+        base_delay: int = 5,
+        timeout: Timeout = None,
+        deadline: Optional[float] = None,
+        chunk_size: int = 65536,
+        priority: int = Priority.NORMAL,
+        endpoints: Optional[EndpointSelector] = None,
+        root: Tuple[str, ...] = ()
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Execute a request and parse the JSON object of the response as it arrives.
+
+        Only failures before the response body starts are retried.
+        The deadline bounds the whole iteration, including time spent by the caller
+        between items.
+
+        :param method: HTTP method.
+        :param url: URL to execute the request.
+        :param headers: Request headers.
+        :param json: Request body in JSON format.
+        :param retries: Number of attempts.
+        :param base_delay: Base delay between attempts.
+        :param timeout: Custom timeouts for a single read of the response.
+        :param deadline: Deadline of the whole iteration in time.monotonic() seconds.
+        :param priority: Priority of the request for the scheduler (see Priority).
+        :param chunk_size: Size of decompressed chunks fed to the parser.
+        :param endpoints: Optional EndpointSelector, url is a path relative to BaseURL then.
+        :param root: Keys of the nested object whose members are returned (see JSONObjectStream).
+        :return: Async iterator of (key, value) members of the response object.
+        :raises DeadlineExceeded: If the deadline passed before the iteration ended.
+        :raises httpx.HTTPError: In case of an HTTP error and retries are exhausted.
+        :raises ValueError: If the response is not a JSON object.
+        """
+        tried = []
+        error = None
+        for attempt in range(1, retries + 1):
+            endpoint = None
+            # The slot is held until the body is consumed, as the connection is
+            # busy until then and the scheduler must not admit more requests than connections
+            async with self._slot(priority, deadline):
+                bounded = is_bounded(timeout or self.timeout, deadline)
+                attempt_timeout = bound_timeout(timeout or self.timeout, deadline)
+                if endpoints is not None:
+                    endpoint = endpoints.select(tried)
+                    tried.append(endpoint)
+                attempt_url = endpoint.base_url + url if endpoint else url
+                call_span = current_span()
+                started = time.monotonic()
+                try:
+                    # The span covers receiving of headers, the body is consumed by the caller
+                    with start_span(
+                        f"HTTP {method}",
+                        self._attempt_attributes(method, attempt_url, attempt),
+                        client=True
+                    ) as span:
+                        request = self.session.build_request(
+                            method,
+                            attempt_url,
+                            headers=inject_context(headers),
+                            json=json,
+                            timeout=attempt_timeout
+                        )
+                        response = await self._within(
+                            self.session.send(request, stream=True),
+                            deadline
+                        )
+                        set_attributes(span, {"http.response.status_code": response.status_code})
+                except DeadlineExceeded as err:
+                    raise self._missed_deadline(err, error)
+                except Exception as err:
+                    self._record(endpoints, endpoint, started, None, err, bounded)
+                    error = err
+                    response = None
+                else:
+                    self._record(endpoints, endpoint, started, response.status_code)
+                if response is not None:
+                    try:
+                        if response.is_error:
+                            await self._within(response.aread(), deadline)
+                            error = self._status_error(response)
+                        else:
+                            set_attributes(call_span, {"http.response.status_code": response.status_code})
+                            parser = JSONObjectStream(root)
+                            chunks = response.aiter_bytes(chunk_size)
+                            while True:
+                                try:
+                                    chunk = await self._within(chunks.__anext__(), deadline)
+                                except StopAsyncIteration:
+                                    break
+                                for item in parser.feed(chunk):
+                                    yield item
+                            parser.close()
+                            return
+                    finally:
+                        await response.aclose()
+            if self._can_fail_over(error, endpoint, endpoints, tried, attempt, retries):
+                continue
+            await self._backoff(error, attempt, retries, base_delay, deadline)
+
     async def get(
         self,
         url: str,
@@ -39,7 +391,10 @@ class HTTPClient:
         params: dict = None,
         retries: int = 3,
         base_delay: int = 5,
-        timeout: Timeout = None
+        timeout: Timeout = None,
+        deadline: Optional[float] = None,
+        priority: int = Priority.NORMAL,
+        endpoints: Optional[EndpointSelector] = None
     ):
         """
         Execute a GET request with retry support.
@@ -50,33 +405,25 @@ class HTTPClient:
         :param retries: Number of attempts.
         :param base_delay: Base delay between attempts.
         :param timeout: Custom timeouts for the request.
+        :param deadline: Deadline of the whole call including retries, in time.monotonic() seconds.
+        :param priority: Priority of the request for the scheduler (see Priority).
+        :param endpoints: Optional EndpointSelector, url is a path relative to BaseURL then.
         :return: Response in JSON format.
         :raises httpx.HTTPStatusError: In case of an HTTP status error.
         :raises Exception: In case of unexpected errors.
         """
-        for attempt in range(1, retries + 1):
-            try:
-                response = await self.session.get(
-                    url,
-                    headers=headers,
-                    params=params,
-                    timeout=timeout or self.timeout
-                )
-                if response.is_error:
-                    error = HTTPError(response.request)
-                    error.status_code = response.status_code
-                    error.text = response.text
-                    error.reason_phrase = response.reason_phrase
-                    raise error
-                return response.json()
-            except httpx.HTTPStatusError:
-                if attempt == retries:
-                    raise
-                await asyncio.sleep(base_delay * attempt)
-            except Exception:
-                if attempt == retries:
-                    raise
-                await asyncio.sleep(base_delay * attempt)
+        return await self._request(
+            "GET",
+            url,
+            headers=headers,
+            params=params,
+            retries=retries,
+            base_delay=base_delay,
+            timeout=timeout,
+            deadline=deadline,
+            priority=priority,
+            endpoints=endpoints
+        )
 
     async def get_json(
         self,
@@ -85,7 +432,10 @@ class HTTPClient:
         json_body: dict = None,
         retries: int = 3,
         base_delay: int = 5,
-        timeout: Timeout = None
+        timeout: Timeout = None,
+        deadline: Optional[float] = None,
+        priority: int = Priority.NORMAL,
+        endpoints: Optional[EndpointSelector] = None
     ) -> dict:
         """
         Execute a GET request with retry support, where the body is passed in JSON format.
@@ -96,40 +446,25 @@ class HTTPClient:
         :param retries: Number of attempts for failed requests.
         :param base_delay: Base delay (in seconds) between retry attempts.
         :param timeout: Custom timeouts for the request.
+        :param deadline: Deadline of the whole call including retries, in time.monotonic() seconds.
+        :param priority: Priority of the request for the scheduler (see Priority).
+        :param endpoints: Optional EndpointSelector, url is a path relative to BaseURL then.
         :return: Server response in JSON format (dict).
         :raises httpx.HTTPStatusError: If the server returned an unsuccessful HTTP status and retries are exhausted.
         :raises Exception: In case of unexpected errors.
         """
-        for attempt in range(1, retries + 1):
-            try:
-                response = await self.session.request(
-                    method="GET",
-                    url=url,
-                    headers=headers,
-                    json=json_body,
-                    timeout=timeout or self.timeout
-                )
-                if response.is_error:
-                    error = HTTPError(response.request)
-                    error.status_code = response.status_code
-                    error.text = response.text
-                    error.reason_phrase = response.reason_phrase
-                    raise error
-                response.raise_for_status()
-
-                return response.json()
-
-            except httpx.HTTPStatusError:
-                if attempt == retries:
-                    raise
-                else:
-                    await asyncio.sleep(base_delay * attempt)
-
-            except Exception:
-                if attempt == retries:
-                    raise
-                else:
-                    await asyncio.sleep(base_delay * attempt)
+        return await self._request(
+            "GET",
+            url,
+            headers=headers,
+            json=json_body,
+            retries=retries,
+            base_delay=base_delay,
+            timeout=timeout,
+            deadline=deadline,
+            priority=priority,
+            endpoints=endpoints
+        )
 
     async def post(
         self,
@@ -138,7 +473,10 @@ class HTTPClient:
         headers: dict = None,
         retries: int = 3,
         base_delay: int = 5,
-        timeout: Timeout = None
+        timeout: Timeout = None,
+        deadline: Optional[float] = None,
+        priority: int = Priority.NORMAL,
+        endpoints: Optional[EndpointSelector] = None
     ):
         """
         Execute a POST request with retry support.
@@ -149,35 +487,62 @@ class HTTPClient:
         :param retries: Number of attempts.
         :param base_delay: Base delay between attempts.
         :param timeout: Custom timeouts for the request.
+        :param deadline: Deadline of the whole call including retries, in time.monotonic() seconds.
+        :param priority: Priority of the request for the scheduler (see Priority).
+        :param endpoints: Optional EndpointSelector, url is a path relative to BaseURL then.
         :return: Response in JSON format.
         :raises httpx.HTTPStatusError: In case of an HTTP status error.
         :raises Exception: In case of unexpected errors.
         """
-        for attempt in range(1, retries + 1):
-            try:
-                response = await self.session.request(
-                    method="POST",
-                    url=url,
-                    headers=headers,
-                    json=json,
-                    timeout=timeout or self.timeout
-                )
-                if response.is_error:
-                    error = HTTPError(response.request)
-                    error.status_code = response.status_code
-                    error.text = response.text
-                    error.reason_phrase = response.reason_phrase
-                    raise error
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError:
-                if attempt == retries:
-                    raise
-                await asyncio.sleep(base_delay * attempt)
-            except Exception:
-                if attempt == retries:
-                    raise
-                await asyncio.sleep(base_delay * attempt)
+        return await self._request(
+            "POST",
+            url,
+            headers=headers,
+            json=json,
+            retries=retries,
+            base_delay=base_delay,
+            timeout=timeout,
+            deadline=deadline,
+            priority=priority,
+            endpoints=endpoints
+        )
+
+    async def ping(self, url: str, timeout: Timeout = None) -> bool:
+        """
+        Send a HEAD request to open or refresh a pooled connection.
+
+        The status of the response doesn't matter, only the connection.
+
+        :param url: URL to send the request to.
+        :param timeout: Custom timeouts for the request.
+        :return: True if the server answered, False otherwise.
+        """
+        try:
+            await self.session.head(url, timeout=timeout or self.timeout)
+        except httpx.HTTPError:
+            return False
+        return True
+
+    async def warmup(
+        self,
+        url: str,
+        n_connections: int = 1,
+        timeout: Timeout = None
+    ) -> int:
+        """
+        Open pooled connections to the host of url ahead of time.
+
+        Requests are sent concurrently, so each of them takes its own connection.
+
+        :param url: URL to send the requests to.
+        :param n_connections: Number of connections to open.
+        :param timeout: Custom timeouts for the requests.
+        :return: Number of connections opened successfully.
+        """
+        results = await asyncio.gather(
+            *(self.ping(url, timeout=timeout) for _ in range(n_connections))
+        )
+        return sum(results)
 
     async def close(self):
         """
@@ -0,0 +1,282 @@
+"""
+Load generator for the whole trade lifecycle in testMode.
+
+Drives synthetic trades through create_trade(testMode=1), emulate_payment,
+get_info polling and cancel_trade with AsyncYellowChanger and reports
+throughput, errors and latency histograms per endpoint.
+
+Example:
+    python -m yellow_changer_api.loadgen --trades 200 --rate 20 --ramp-up 10 \\
+        --concurrency 50 --base-url http://127.0.0.1:8000/
+
+API keys are taken from --public-key/--secret-key or YELLOWCHANGER_PUBLIC_KEY
+and YELLOWCHANGER_SECRET_KEY environment variables.
+"""
+import argparse
+import asyncio
+import math
+import os
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+import httpx
+
+from .yellow_changer import AsyncYellowChanger
+
+
+# Upper bounds of latency histogram buckets in milliseconds
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, math.inf)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        """
+        Latencies of a single endpoint.
+        """
+        self.samples = []
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, percentile: float) -> float:
+        """
+        :param percentile: Percentile between 0 and 1
+        :return: Latency in seconds
+        """
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        index = min(len(samples) - 1, int(len(samples) * percentile))
+        return samples[index]
+
+    def buckets(self) -> list:
+        """
+        :return: List of (upper bound in ms, count) pairs
+        """
+        counts = Counter()
+        for sample in self.samples:
+            ms = sample * 1000
+            counts[next(bound for bound in BUCKETS_MS if ms <= bound)] += 1
+        return [(bound, counts[bound]) for bound in BUCKETS_MS]
+
+
+class LoadStats:
+    def __init__(self):
+        """
+        Results of a load run.
+        """
+        self.latencies = defaultdict(LatencyHistogram)
+        self.errors = Counter()
+        self.error_examples = {}
+        self.trades_started = 0
+        self.trades_completed = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    async def timed(self, endpoint: str, coro):
+        """
+        Await coro and record its latency or error under endpoint.
+        """
+        started = time.monotonic()
+        try:
+            result = await coro
+        except Exception as err:
+            key = (endpoint, type(err).__name__)
+            self.errors[key] += 1
+            self.error_examples.setdefault(key, str(err)[:200])
+            raise
+        self.latencies[endpoint].record(time.monotonic() - started)
+        return result
+
+    def report(self) -> str:
+        """
+        :return: Human readable report
+        """
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        requests_done = sum(len(h.samples) for h in self.latencies.values())
+        lines = [
+            f"Elapsed: {elapsed:.2f} s",
+            f"Trades: {self.trades_started} started, {self.trades_completed} completed, "
+            f"{self.trades_completed / elapsed if elapsed else 0:.2f} trades/s",
+            f"Requests: {requests_done} succeeded, {sum(self.errors.values())} failed, "
+            f"{requests_done / elapsed if elapsed else 0:.2f} req/s",
+            "",
+            f"{'endpoint':<18}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+        ]
+        for endpoint, histogram in sorted(self.latencies.items()):
+            lines.append(
+                f"{endpoint:<18}{len(histogram.samples):>8}"
+                f"{histogram.percentile(0.5) * 1000:>10.1f}"
+                f"{histogram.percentile(0.9) * 1000:>10.1f}"
+                f"{histogram.percentile(0.99) * 1000:>10.1f}"
+                f"{max(histogram.samples) * 1000:>10.1f}"
+            )
+        for endpoint, histogram in sorted(self.latencies.items()):
+            lines.append("")
+            lines.append(f"{endpoint} latency histogram:")
+            total = len(histogram.samples)
+            for bound, count in histogram.buckets():
+                if not count:
+                    continue
+                label = "inf" if bound == math.inf else f"{bound}"
+                bar = "#" * max(1, round(40 * count / total))
+                lines.append(f"  <= {label:>6} ms {count:>7} {bar}")
+        if self.errors:
+            lines.append("")
+            lines.append("Errors:")
+            for (endpoint, error), count in self.errors.most_common():
+                example = self.error_examples[(endpoint, error)]
+                lines.append(f"  {endpoint:<18}{error:<20}{count:>7}  {example}")
+        return "\n".join(lines)
+
+
+def start_offset(index: int, rate: float, ramp_up: float) -> float:
+    """
+    Start time of the index-th trade for a linear ramp-up to the target rate.
+
+    :param index: Number of the trade, starting from 0
+    :param rate: Target rate in trades per second
+    :param ramp_up: Duration of the ramp-up in seconds
+    :return: Offset from the beginning of the run in seconds
+    """
+    ramp_trades = rate * ramp_up / 2
+    if ramp_up > 0 and index < ramp_trades:
+        return math.sqrt(2 * ramp_up * index / rate)
+    return ramp_up + (index - ramp_trades) / rate
+
+
+async def run_trade(
+    yellow_changer: AsyncYellowChanger,
+    stats: LoadStats,
+    args: argparse.Namespace
+):
+    """
+    Drive one synthetic trade through its lifecycle.
+    """
+    stats.trades_started += 1
+    trade = await stats.timed("create_trade", yellow_changer.create_trade(
+        send_name=args.send_name,
+        get_name=args.get_name,
+        send_network=args.send_network,
+        get_network=args.get_network,
+        get_creds=args.get_creds,
+        send_value=args.send_value,
+        testMode=1,
+        timeout=args.timeout
+    ))
+    uniq_id = trade.get("uniq_id") if isinstance(trade, dict) else None
+    if not uniq_id:
+        key = ("create_trade", "MissingUniqId")
+        stats.errors[key] += 1
+        stats.error_examples.setdefault(key, str(trade)[:200])
+        return
+
+    try:
+        await stats.timed("emulate_payment", yellow_changer.emulate_payment(
+            uniq_id=uniq_id,
+            paidAmount=str(args.send_value),
+            withdrawStatus="sent",
+            depositStatus="user_paid",
+            isInvalidRequisites=0,
+            timeout=args.timeout
+        ))
+        for _ in range(args.polls):
+            await asyncio.sleep(args.poll_interval)
+            await stats.timed(
+                "get_info", yellow_changer.get_info(uniq_id, timeout=args.timeout)
+            )
+    except Exception:
+        # Don't leave the trade open, the cleanup is recorded apart from the lifecycle
+        try:
+            await stats.timed(
+                "cancel_cleanup", yellow_changer.cancel_trade(uniq_id, timeout=args.timeout)
+            )
+        except Exception:
+            pass
+        raise
+    await stats.timed(
+        "cancel_trade", yellow_changer.cancel_trade(uniq_id, timeout=args.timeout)
+    )
+    stats.trades_completed += 1
+
+
+async def run(args: argparse.Namespace) -> LoadStats:
+    """
+    Run the load and collect statistics.
+    """
+    stats = LoadStats()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(
+        max_connections=args.concurrency,
+        max_keepalive_connections=args.concurrency
+    )
+
+    async def worker(index: int):
+        delay = stats.started_at + start_offset(index, args.rate, args.ramp_up) - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with semaphore:
+            try:
+                await run_trade(yellow_changer, stats, args)
+            except Exception:
+                # Already recorded in stats.errors
+                pass
+
+    async with AsyncYellowChanger(
+        args.public_key,
+        args.secret_key,
+        base_url=args.base_url,
+        limits=limits
+    ) as yellow_changer:
+        if args.warmup:
+            await yellow_changer.warmup(min(args.warmup, args.concurrency))
+        stats.started_at = time.monotonic()
+        await asyncio.gather(*(worker(index) for index in range(args.trades)))
+        stats.finished_at = time.monotonic()
+    return stats
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m yellow_changer_api.loadgen",
+        description="Load generator for the trade lifecycle in testMode."
+    )
+    parser.add_argument("--public-key", default=os.environ.get("YELLOWCHANGER_PUBLIC_KEY"))
+    parser.add_argument("--secret-key", default=os.environ.get("YELLOWCHANGER_SECRET_KEY"))
+    parser.add_argument(
+        "--base-url",
+        nargs="+",
+        default=None,
+        help="BaseURL of API, e.g. a local stand-in, or several BaseURLs to fail over between"
+    )
+    parser.add_argument("--trades", type=int, default=100, help="Number of trades")
+    parser.add_argument("--rate", type=float, default=10.0, help="Target rate of new trades per second")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds to reach the target rate")
+    parser.add_argument("--concurrency", type=int, default=50, help="Maximum number of trades in flight")
+    parser.add_argument("--polls", type=int, default=3, help="get_info calls per trade")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between get_info calls")
+    parser.add_argument("--timeout", type=float, default=None, help="Total time limit of every call")
+    parser.add_argument("--warmup", type=int, default=0, help="Connections to open before the run")
+    parser.add_argument("--send-name", default="USDT")
+    parser.add_argument("--get-name", default="USDT")
+    parser.add_argument("--send-network", default="TRC20")
+    parser.add_argument("--get-network", default="ERC20")
+    parser.add_argument("--send-value", type=float, default=100.0)
+    parser.add_argument("--get-creds", default="0x4c0101a8CB61766bbE110BB530C03A58383e3545")
+    args = parser.parse_args(argv)
+    if not args.public_key or not args.secret_key:
+        parser.error("API keys are required: --public-key/--secret-key or YELLOWCHANGER_*_KEY")
+    if args.rate <= 0 or args.concurrency <= 0:
+        parser.error("--rate and --concurrency must be positive")
+    return args
+
+
+def main(argv: Optional[list] = None):
+    args = parse_args(argv)
+    stats = asyncio.run(run(args))
+    print(stats.report())
+
+
+if __name__ == "__main__":
+    main()
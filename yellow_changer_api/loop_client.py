@@ -0,0 +1,244 @@
+import asyncio
+import functools
+import threading
+from typing import Optional, Union
+
+from .http_client import H2_INSTALLED
+from .scheduling import current_priority, use_priority
+from .yellow_changer import AsyncYellowChanger
+
+
+class EventLoopThread:
+    def __init__(self, name: str = "yellowchanger-loop"):
+        """
+        asyncio event loop running forever in a daemon thread.
+
+        Coroutines are submitted from any thread with run().
+
+        :param name: Name of the thread
+        """
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever,
+            name=name,
+            daemon=True
+        )
+        self.thread.start()
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """
+        Execute coroutine in the loop and wait for its result.
+
+        :param coro: Coroutine to execute
+        :param timeout: Time limit of waiting in seconds
+        :return: Result of the coroutine
+        """
+        if threading.current_thread() is self.thread:
+            coro.close()
+            raise RuntimeError("Blocking call from the event loop thread would deadlock")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def stop(self):
+        """
+        Stop the loop and wait for the thread.
+        """
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+_default_loop: Optional[EventLoopThread] = None
+_default_loop_lock = threading.Lock()
+
+
+def default_loop() -> EventLoopThread:
+    """
+    Event loop thread shared by every LoopYellowChanger of the process.
+    """
+    global _default_loop
+    with _default_loop_lock:
+        if _default_loop is None or _default_loop.loop.is_closed():
+            _default_loop = EventLoopThread()
+        return _default_loop
+
+
+async def _with_priority(coro, priority: Optional[int]):
+    if priority is None:
+        return await coro
+    with use_priority(priority):
+        return await coro
+
+
+def _delegate(name: str):
+    method = getattr(AsyncYellowChanger, name)
+
+    @functools.wraps(method)
+    def call(self, *args, **kwargs):
+        return self._run(getattr(self.client, name)(*args, **kwargs))
+
+    return call
+
+
+class LoopYellowChanger():
+    def __init__(
+        self,
+        public_api_key: str,
+        secret_api_key: str,
+        base_url: Union[None, str, list] = None,
+        loop: Union[EventLoopThread, None] = None,
+        **kwargs
+    ):
+        """
+        Synchronous client running AsyncYellowChanger in a background event loop.
+
+        Calls from any number of threads go through one loop, so they share
+        one pool of httpx connections, HTTP/2 multiplexing (if h2 is installed)
+        and coalescing of identical concurrent GET requests.
+
+        :param public_api_key: Public API Key obtained from https://yellowchanger.com/auth/register
+        :param secret_api_key: Secret API Key obtained from https://yellowchanger.com/auth/register
+        :param base_url: BaseURL of API, if domain will be changed, or list of BaseURLs
+        :param loop: EventLoopThread to run requests in, shared default_loop() by default
+        :param kwargs: Other arguments of AsyncYellowChanger
+        """
+        kwargs.setdefault("http2", H2_INSTALLED)
+        kwargs.setdefault("coalesce", True)
+        self.loop = loop or default_loop()
+        self.client = AsyncYellowChanger(
+            public_api_key,
+            secret_api_key,
+            base_url=base_url,
+            **kwargs
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """
+        Close pooled connections when exiting context.
+        """
+        self.close()
+
+    @property
+    def base_url(self) -> str:
+        return self.client.base_url
+
+    @base_url.setter
+    def base_url(self, base_url: Union[str, list]):
+        self.client.base_url = base_url
+
+    def _run(self, coro):
+        # use_priority of the calling thread doesn't reach the loop thread by itself
+        return self.loop.run(_with_priority(coro, current_priority(None)))
+
+    all_rates = _delegate("all_rates")
+    destinations_list = _delegate("destinations_list")
+    load_preflight = _delegate("load_preflight")
+    rates_in_direction = _delegate("rates_in_direction")
+    get_info = _delegate("get_info")
+    create_trade = _delegate("create_trade")
+    cancel_trade = _delegate("cancel_trade")
+    change_credentials = _delegate("change_credentials")
+    emulate_payment = _delegate("emulate_payment")
+    warmup = _delegate("warmup")
+    stop_keepalive = _delegate("stop_keepalive")
+    close = _delegate("close")
+
+    def start_keepalive(self, interval: float = 4.0, n_connections: int = 1):
+        """
+        Start keep-alive task in the background loop,
+        see AsyncYellowChanger.start_keepalive
+        """
+        async def start():
+            self.client.start_keepalive(interval, n_connections)
+
+        self.loop.run(start())
+
+    def iter_all_rates(self, *args, batch_size: int = 1000, **kwargs):
+        """
+        Gets all rates, parsing the response as it arrives,
+        see AsyncYellowChanger.iter_all_rates
+
+        :param batch_size: Number of entries passed from the loop thread at once
+        :return: Iterator of (pair, rate) members of the allRates response
+        """
+        rates = self.client.iter_all_rates(*args, **kwargs)
+
+        async def next_batch():
+            batch = []
+            try:
+                while len(batch) < batch_size:
+                    batch.append(await rates.__anext__())
+            except StopAsyncIteration:
+                return batch, True
+            return batch, False
+
+        try:
+            finished = False
+            while not finished:
+                batch, finished = self._run(next_batch())
+                yield from batch
+        finally:
+            self.loop.run(rates.aclose())
+
+    def __gather(self, method, items: list, timeout: Union[float, None] = None) -> list:
+        async def gather():
+            return await asyncio.gather(
+                *(method(item, timeout=timeout) for item in items),
+                return_exceptions=True
+            )
+
+        return self._run(gather())
+
+    def get_info_many(self, uniq_ids: list, timeout: Union[float, None] = None) -> list:
+        """
+        Gets information about many trades concurrently
+
+        :param uniq_ids: uniq_id of every trade
+        :param timeout: Total time limit of all calls in seconds
+        :return: List in order of uniq_ids with information about transaction
+            or exception (BadRequest, DeadlineExceeded) if the request failed
+        """
+        return self.__gather(self.client.get_info, uniq_ids, timeout=timeout)
+
+    def cancel_trades(self, uniq_ids: list, timeout: Union[float, None] = None) -> list:
+        """
+        Cancels many exchanges concurrently
+
+        :param uniq_ids: Unique IDs of the trades to cancel
+        :param timeout: Total time limit of all calls in seconds
+        :return: List in order of uniq_ids with API response data about the canceled trade
+            or exception (BadRequest, DeadlineExceeded) if the request failed
+        """
+        return self.__gather(self.client.cancel_trade, uniq_ids, timeout=timeout)
+
+    def rates_in_directions(
+        self,
+        directions: list,
+        exch_type: str = "yellow",
+        commission_crypto_to_rub: float = 0.5,
+        commission_crypto_to_crypto: float = 0.5,
+        timeout: Union[float, None] = None
+    ) -> list:
+        """
+        Gets rates in many directions concurrently,
+        see rates_in_direction for details
+
+        :param directions: directions of rate, for example: ['USDT', 'BTC']
+        :param timeout: Total time limit of all calls in seconds
+        :return: List in order of directions with rates in a certain direction
+            or exception (BadRequest, DeadlineExceeded) if the request failed
+        """
+        def rates(direction, timeout=None):
+            return self.client.rates_in_direction(
+                direction,
+                exch_type=exch_type,
+                commission_crypto_to_rub=commission_crypto_to_rub,
+                commission_crypto_to_crypto=commission_crypto_to_crypto,
+                timeout=timeout
+            )
+
+        return self.__gather(rates, directions, timeout=timeout)
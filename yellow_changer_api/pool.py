@@ -0,0 +1,325 @@
+import asyncio
+import itertools
+import time
+from typing import Optional
+
+from .exceptions import BadRequest, DeadlineExceeded, UnknownTrade
+from .yellow_changer import AsyncYellowChanger
+
+
+# HTTP statuses which mean a problem of the API key, not of the request
+_KEY_FAILURE_STATUSES = {401, 403, 429}
+
+
+def _is_key_failure(err: BadRequest) -> bool:
+    """
+    Whether err should count against health of the API key.
+
+    Transport errors, 5xx and auth/rate limit statuses do,
+    other 4xx statuses are errors of the request itself.
+    A missed deadline is a limit of the caller, it counts only
+    if an earlier attempt was rejected by auth or rate limit.
+    """
+    status = err.status_code
+    if isinstance(err, DeadlineExceeded):
+        return status in _KEY_FAILURE_STATUSES
+    return status is None or status >= 500 or status in _KEY_FAILURE_STATUSES
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Take a token.
+
+        :return: 0 if taken, otherwise seconds until a token is available
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class PoolMember:
+    def __init__(
+        self,
+        client: AsyncYellowChanger,
+        rate_limit: Optional[float] = None,
+        burst: Optional[float] = None
+    ):
+        """
+        API key pair of the pool with its load, rate budget and health.
+
+        :param client: Client bound to the key pair
+        :param rate_limit: Requests per second allowed for the key, None means unlimited
+        :param burst: Requests which may be sent at once, rate_limit by default
+        """
+        self.client = client
+        self.bucket = _TokenBucket(rate_limit, burst or max(1.0, rate_limit)) if rate_limit else None
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+
+    @property
+    def public_api_key(self) -> str:
+        return self.client.public_api_key
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "healthy": self.healthy(),
+        }
+
+
+class YellowChangerPool():
+    def __init__(
+        self,
+        credentials: list,
+        base_url: Optional[str] = None,
+        strategy: str = "least_loaded",
+        rate_limit: Optional[float] = None,
+        burst: Optional[float] = None,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        **kwargs
+    ):
+        """
+        Spreads calls across several API key pairs, each with its own upstream limits.
+
+        Calls which are not tied to a trade go to a healthy key chosen by strategy.
+        get_info, cancel_trade, change_credentials and emulate_payment always go
+        to the key which created the trade.
+
+        :param credentials: List of (public_api_key, secret_api_key) pairs or AsyncYellowChanger clients
+        :param base_url: BaseURL of API, if domain will be changed
+        :param strategy: "least_loaded" (fewest requests in flight) or "round_robin"
+        :param rate_limit: Requests per second allowed for every key, None means unlimited
+        :param burst: Requests which may be sent at once by every key, rate_limit by default
+        :param failure_threshold: Consecutive failures after which the key is skipped
+        :param cooldown: Seconds the unhealthy key is skipped for
+        :param kwargs: Other arguments of AsyncYellowChanger
+        """
+        if strategy not in ("least_loaded", "round_robin"):
+            raise ValueError("strategy must be 'least_loaded' or 'round_robin'")
+        if not credentials:
+            raise ValueError("credentials must not be empty")
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.members = []
+        for item in credentials:
+            if isinstance(item, AsyncYellowChanger):
+                client = item
+            else:
+                public_api_key, secret_api_key = item
+                client = AsyncYellowChanger(
+                    public_api_key, secret_api_key, base_url=base_url, **kwargs
+                )
+            self.members.append(PoolMember(client, rate_limit=rate_limit, burst=burst))
+        self._by_key = {member.public_api_key: member for member in self.members}
+        self._owners = {}
+        self._round_robin = itertools.count()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        Close pooled connections of every client when exiting context.
+        """
+        await self.close()
+
+    async def close(self):
+        """
+        Close pooled connections of every client.
+        """
+        await asyncio.gather(*(member.client.close() for member in self.members))
+
+    def stats(self) -> dict:
+        """
+        :return: Dictionary of load and health stats per public_api_key
+        """
+        return {member.public_api_key: member.stats() for member in self.members}
+
+    def assign(self, uniq_id: str, public_api_key: str):
+        """
+        Bind a trade to the key which created it, e.g. after restart of the process.
+
+        :param uniq_id: Unique ID of the trade
+        :param public_api_key: Public API Key of a pool member
+        """
+        if public_api_key not in self._by_key:
+            raise ValueError("public_api_key is not a member of the pool")
+        self._owners[str(uniq_id)] = self._by_key[public_api_key]
+
+    def forget(self, uniq_id: str):
+        """
+        Drop the binding of a finished trade, so the pool doesn't grow
+        in a long-running service. Canceled trades are dropped automatically.
+
+        :param uniq_id: Unique ID of the trade
+        """
+        self._owners.pop(str(uniq_id), None)
+
+    def owner(self, uniq_id: str) -> Optional[str]:
+        """
+        :return: Public API Key which created the trade or None if it's unknown
+        """
+        member = self._owners.get(str(uniq_id))
+        return member.public_api_key if member else None
+
+    def __candidates(self) -> list:
+        healthy = [member for member in self.members if member.healthy()]
+        # If every key is unhealthy, trying them is better than failing outright
+        candidates = healthy or list(self.members)
+        start = next(self._round_robin) % len(candidates)
+        candidates = candidates[start:] + candidates[:start]
+        if self.strategy == "least_loaded":
+            candidates.sort(key=lambda member: member.in_flight)
+        return candidates
+
+    async def __select(self) -> PoolMember:
+        while True:
+            waits = []
+            for member in self.__candidates():
+                wait = member.bucket.take() if member.bucket else 0.0
+                if not wait:
+                    return member
+                waits.append(wait)
+            await asyncio.sleep(min(waits))
+
+    async def __acquire(self, member: PoolMember):
+        while member.bucket:
+            wait = member.bucket.take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    async def __call(self, member: PoolMember, method: str, *args, **kwargs):
+        member.in_flight += 1
+        member.requests += 1
+        try:
+            result = await getattr(member.client, method)(*args, **kwargs)
+        except BadRequest as err:
+            if _is_key_failure(err):
+                member.failures += 1
+                member.consecutive_failures += 1
+                if member.consecutive_failures >= self.failure_threshold:
+                    member.unhealthy_until = time.monotonic() + self.cooldown
+            raise
+        finally:
+            member.in_flight -= 1
+        member.consecutive_failures = 0
+        return result
+
+    async def __any(self, method: str, *args, **kwargs):
+        member = await self.__select()
+        return await self.__call(member, method, *args, **kwargs)
+
+    async def __pinned(self, uniq_id: str, method: str, *args, **kwargs):
+        member = self._owners.get(str(uniq_id))
+        if member is None:
+            raise UnknownTrade(f"Trade {uniq_id} was not created by this pool")
+        await self.__acquire(member)
+        return await self.__call(member, method, uniq_id, *args, **kwargs)
+
+    async def all_rates(self, *args, **kwargs):
+        """
+        Gets all rates with any key, see AsyncYellowChanger.all_rates
+        """
+        return await self.__any("all_rates", *args, **kwargs)
+
+    async def destinations_list(self, *args, **kwargs):
+        """
+        Gets all destinations list with any key, see AsyncYellowChanger.destinations_list
+        """
+        return await self.__any("destinations_list", *args, **kwargs)
+
+    async def rates_in_direction(self, *args, **kwargs):
+        """
+        Gets all rates in specific direction with any key,
+        see AsyncYellowChanger.rates_in_direction
+        """
+        return await self.__any("rates_in_direction", *args, **kwargs)
+
+    async def create_trade(self, *args, **kwargs):
+        """
+        Creates a new trade with the key chosen by strategy and remembers the key,
+        see AsyncYellowChanger.create_trade
+
+        :return: Dictionary with API response data about the created trade.
+        """
+        member = await self.__select()
+        trade = await self.__call(member, "create_trade", *args, **kwargs)
+        uniq_id = kwargs.get("uniq_id")
+        if isinstance(trade, dict) and trade.get("uniq_id"):
+            uniq_id = trade["uniq_id"]
+        if uniq_id:
+            self._owners[str(uniq_id)] = member
+        return trade
+
+    async def get_info(self, uniq_id: str, *args, **kwargs):
+        """
+        Gets information about trade with the key which created it,
+        see AsyncYellowChanger.get_info
+
+        :raises UnknownTrade: If the trade was not created by this pool.
+        """
+        return await self.__pinned(uniq_id, "get_info", *args, **kwargs)
+
+    async def cancel_trade(self, uniq_id: str, *args, **kwargs):
+        """
+        Cancels a exchange with the key which created it,
+        see AsyncYellowChanger.cancel_trade
+
+        :raises UnknownTrade: If the trade was not created by this pool.
+        """
+        result = await self.__pinned(uniq_id, "cancel_trade", *args, **kwargs)
+        self.forget(uniq_id)
+        return result
+
+    async def change_credentials(self, uniq_id: str, *args, **kwargs):
+        """
+        Changes the receiving credentials with the key which created the trade,
+        see AsyncYellowChanger.change_credentials
+
+        :raises UnknownTrade: If the trade was not created by this pool.
+        """
+        return await self.__pinned(uniq_id, "change_credentials", *args, **kwargs)
+
+    async def emulate_payment(self, uniq_id: str, *args, **kwargs):
+        """
+        Emulates a payment with the key which created the trade,
+        see AsyncYellowChanger.emulate_payment
+
+        :raises UnknownTrade: If the trade was not created by this pool.
+        """
+        return await self.__pinned(uniq_id, "emulate_payment", *args, **kwargs)
+
+    async def warmup(self, n_connections: int = 1) -> int:
+        """
+        Open pooled connections of every client ahead of time.
+
+        :param n_connections: Number of connections per client
+        :return: Number of connections opened successfully
+        """
+        results = await asyncio.gather(
+            *(member.client.warmup(n_connections) for member in self.members)
+        )
+        return sum(results)
+
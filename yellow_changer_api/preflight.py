@@ -0,0 +1,170 @@
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+from .exceptions import AmountOutOfRange, UnsupportedDirection
+
+
+class Limits(NamedTuple):
+    min_send: Optional[float] = None
+    max_send: Optional[float] = None
+    min_get: Optional[float] = None
+    max_get: Optional[float] = None
+
+    def merge(self, other: "Limits") -> "Limits":
+        return Limits(*(
+            mine if mine is not None else theirs
+            for mine, theirs in zip(self, other)
+        ))
+
+
+# Field names of direction records in destinationsList/allRates responses
+_DIRECTION_FIELDS = ("send_name", "send_network", "get_name", "get_network")
+_LIMIT_FIELDS = {
+    "min_send": ("min_send", "minSend", "send_min", "min_send_value", "min_amount", "min"),
+    "max_send": ("max_send", "maxSend", "send_max", "max_send_value", "max_amount", "max"),
+    "min_get": ("min_get", "minGet", "get_min", "min_get_value"),
+    "max_get": ("max_get", "maxGet", "get_max", "max_get_value"),
+}
+
+
+def direction_key(
+    send_name: str,
+    send_network: str,
+    get_name: str,
+    get_network: str
+) -> Tuple[str, str, str, str]:
+    return (
+        str(send_name).upper(),
+        str(send_network).upper(),
+        str(get_name).upper(),
+        str(get_network).upper()
+    )
+
+
+def _records(payload) -> Iterator[dict]:
+    """
+    Every dictionary nested in payload.
+    """
+    stack = [payload]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            yield item
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+
+
+def _number(record: dict, names: tuple) -> Optional[float]:
+    for name in names:
+        value = record.get(name)
+        if value is None or isinstance(value, bool):
+            continue
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class PreflightValidator:
+    def __init__(self, directions: Optional[dict] = None):
+        """
+        Local index of supported exchange directions and their limits,
+        so impossible trades are rejected before any network I/O.
+
+        Usually built from destinations_list() and all_rates() responses
+        with from_catalog(), or by client.load_preflight().
+
+        :param directions: Dictionary of Limits keyed by direction_key(...)
+        """
+        self.directions = directions or {}
+
+    @classmethod
+    def from_catalog(cls, destinations, rates=None) -> "PreflightValidator":
+        """
+        Build the index from destinationsList and allRates responses.
+
+        Every record with send_name, send_network, get_name and get_network
+        fields is a supported direction, min/max fields of the record are
+        used as limits of send_value and get_value.
+
+        :param destinations: Response of destinations_list()
+        :param rates: Response of all_rates(), optional source of limits
+        :return: PreflightValidator
+        """
+        validator = cls()
+        for payload in (destinations, rates):
+            for record in _records(payload):
+                if not all(record.get(field) for field in _DIRECTION_FIELDS):
+                    continue
+                validator.add_direction(
+                    *(record[field] for field in _DIRECTION_FIELDS),
+                    **{
+                        limit: _number(record, names)
+                        for limit, names in _LIMIT_FIELDS.items()
+                    }
+                )
+        return validator
+
+    def add_direction(
+        self,
+        send_name: str,
+        send_network: str,
+        get_name: str,
+        get_network: str,
+        min_send: Optional[float] = None,
+        max_send: Optional[float] = None,
+        min_get: Optional[float] = None,
+        max_get: Optional[float] = None
+    ):
+        """
+        Add supported direction or limits of a known direction.
+
+        :param min_send: Minimum send_value, None if unknown
+        :param max_send: Maximum send_value, None if unknown
+        :param min_get: Minimum get_value, None if unknown
+        :param max_get: Maximum get_value, None if unknown
+        """
+        key = direction_key(send_name, send_network, get_name, get_network)
+        limits = Limits(min_send, max_send, min_get, max_get)
+        if key in self.directions:
+            limits = self.directions[key].merge(limits)
+        self.directions[key] = limits
+
+    def check(
+        self,
+        send_name: str,
+        send_network: str,
+        get_name: str,
+        get_network: str,
+        send_value: Optional[float] = None,
+        get_value: Optional[float] = None
+    ):
+        """
+        Check that the trade is possible.
+
+        An empty index accepts every trade, so a catalog which couldn't be
+        parsed never blocks trading.
+
+        :raises UnsupportedDirection: If the direction is not in the catalog.
+        :raises AmountOutOfRange: If send_value or get_value is out of limits.
+        """
+        if not self.directions:
+            return
+        key = direction_key(send_name, send_network, get_name, get_network)
+        limits = self.directions.get(key)
+        if limits is None:
+            raise UnsupportedDirection(
+                f"Direction {send_name} ({send_network}) -> {get_name} ({get_network}) is not supported"
+            )
+        for name, value, low, high in (
+            ("send_value", send_value, limits.min_send, limits.max_send),
+            ("get_value", get_value, limits.min_get, limits.max_get),
+        ):
+            if not value:
+                continue
+            if (low is not None and value < low) or (high is not None and value > high):
+                raise AmountOutOfRange(
+                    f"{name} {value} is out of range [{low}, {high}] "
+                    f"for {send_name} ({send_network}) -> {get_name} ({get_network})"
+                )
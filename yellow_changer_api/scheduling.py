@@ -0,0 +1,149 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+
+
+class Priority(IntEnum):
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+# Trade operations preempt background polling of rates and trade info
+ENDPOINT_PRIORITIES = {
+    "trades/createTrade": Priority.HIGH,
+    "trades/cancelTrade": Priority.HIGH,
+    "trades/changeCredentials": Priority.HIGH,
+    "trades/emulatePayment": Priority.NORMAL,
+    "trades/ratesInDirection": Priority.NORMAL,
+    "trades/getInfo": Priority.LOW,
+    "trades/allRates": Priority.LOW,
+    "trades/destinationsList": Priority.LOW,
+}
+
+
+class PriorityScheduler:
+    def __init__(self, max_concurrency: int, reserved: int = 1):
+        """
+        Limits number of requests in flight and admits waiting requests
+        in order of priority.
+
+        The last `reserved` slots are kept for HIGH priority requests,
+        so trade operations don't wait behind background polling
+        when the pool is saturated.
+
+        :param max_concurrency: Maximum number of requests in flight
+        :param reserved: Slots which only HIGH priority requests may take
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive")
+        if not 0 <= reserved < max_concurrency:
+            raise ValueError("reserved must be between 0 and max_concurrency - 1")
+        self.max_concurrency = max_concurrency
+        self.reserved = reserved
+        self.active = 0
+        self._waiters = []
+        self._order = itertools.count()
+
+    def _can_admit(self, priority: int) -> bool:
+        free = self.max_concurrency - self.active
+        if priority <= Priority.HIGH:
+            return free > 0
+        return free > self.reserved
+
+    def _has_waiters(self, priority: int) -> bool:
+        return any(
+            waiter_priority <= priority and not future.done()
+            for waiter_priority, _, future in self._waiters
+        )
+
+    def waiting(self) -> dict:
+        """
+        :return: Number of waiting requests per priority
+        """
+        counts = {priority.name: 0 for priority in Priority}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                counts[Priority(priority).name] += 1
+        return counts
+
+    async def acquire(self, priority: int = Priority.NORMAL):
+        """
+        Wait for a slot.
+
+        :param priority: Priority of the request, lower value is served first
+        """
+        if self._can_admit(priority) and not self._has_waiters(priority):
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may be granted right before cancellation
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        """
+        Free a slot and admit waiting requests.
+        """
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._can_admit(priority):
+                break
+            heapq.heappop(self._waiters)
+            self.active += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = Priority.NORMAL):
+        """
+        Hold a slot inside the block.
+
+        :param priority: Priority of the request, lower value is served first
+        """
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_priority_override = contextvars.ContextVar("yellowchanger_priority", default=None)
+
+
+@contextmanager
+def use_priority(priority: int):
+    """
+    Override priority of every request sent inside the block by the current task,
+    e.g. to serve a user-facing get_info before background polling.
+
+    :param priority: Priority of the requests (see Priority)
+    """
+    token = _priority_override.set(priority)
+    try:
+        yield
+    finally:
+        _priority_override.reset(token)
+
+
+def current_priority(default: int) -> int:
+    """
+    :param default: Priority used if there is no override
+    :return: Priority set by use_priority or default
+    """
+    override = _priority_override.get()
+    return default if override is None else override
@@ -0,0 +1,228 @@
+import codecs
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+try:
+    import brotli  # noqa: F401
+    BROTLI_INSTALLED = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI_INSTALLED = True
+    except ImportError:
+        BROTLI_INSTALLED = False
+
+
+# Both httpx and requests decode brotli only if brotli or brotlicffi is installed
+ACCEPT_ENCODING = "br, gzip, deflate" if BROTLI_INSTALLED else "gzip, deflate"
+
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",}"
+# Characters which change nesting of a JSON value outside of strings
+_STRUCTURE = re.compile(r'["{}\[\]]')
+# Rest of a JSON string after the opening quote, including the closing quote
+_STRING_REST = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+# End of a number, true, false or null
+_SCALAR_END = re.compile(r'[\s,}\]]')
+
+
+class JSONObjectStream:
+    def __init__(self, root: Tuple[str, ...] = ()):
+        """
+        Incremental parser of a JSON object.
+
+        Chunks of the response are fed as they arrive and every member
+        of the object is returned as soon as its value is complete, so the
+        whole body is never buffered. Values are scanned once for their end
+        and decoded only when complete, so parsing time is linear in the
+        size of the body.
+
+        :param root: Keys of the nested object whose members are returned,
+            e.g. ("data",) for {"data": {...}}, other members are skipped.
+            Members of the top-level object by default
+        """
+        self.root = tuple(root)
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._key = None
+        # Number of root keys entered
+        self._level = 0
+        # Progress of scanning the current value, relative to the buffer
+        self._scan_pos = None
+        self._depth = 0
+        self._in_string = False
+
+    def feed(self, chunk: bytes) -> List[Tuple[str, Any]]:
+        """
+        Feed next chunk of the response.
+
+        :param chunk: Bytes of the response body
+        :return: List of (key, value) members completed by this chunk
+        :raises ValueError: If the body is not a JSON object.
+        """
+        self._buffer += self._text_decoder.decode(chunk)
+        items = []
+        while self._advance(items):
+            pass
+        # Drop consumed text, so the buffer holds at most one incomplete member
+        self._buffer = self._buffer[self._pos:]
+        if self._scan_pos is not None:
+            self._scan_pos -= self._pos
+        self._pos = 0
+        return items
+
+    def close(self):
+        """
+        Check that the whole object was received.
+
+        :raises ValueError: If the body ended before the object was complete.
+        """
+        self._buffer += self._text_decoder.decode(b"", final=True)
+        if self._state != "end" or self._buffer[self._pos:].strip(_WHITESPACE):
+            raise ValueError("Response body is not a complete JSON object")
+
+    def _skip_whitespace(self) -> bool:
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+            self._pos += 1
+        return self._pos < len(self._buffer)
+
+    def _scan_value(self) -> Optional[int]:
+        """
+        Continue scanning the value which starts at the current position.
+
+        :return: End of the value or None if more data is needed
+        """
+        buffer = self._buffer
+        if self._scan_pos is None:
+            char = buffer[self._pos]
+            self._scan_pos = self._pos + 1
+            self._depth = 0
+            self._in_string = char == '"'
+            if char in "{[":
+                self._depth = 1
+            elif char != '"':
+                # A number may be cut in the middle, e.g. "1.5" arriving as "1" and ".5",
+                # so the value is complete only when followed by a delimiter
+                match = _SCALAR_END.search(buffer, self._scan_pos)
+                if match is None:
+                    self._scan_pos = None
+                    return None
+                return match.start()
+
+        pos = self._scan_pos
+        while True:
+            if self._in_string:
+                match = _STRING_REST.match(buffer, pos)
+                if match is None:
+                    # Strings are short, the unfinished one is scanned again with the next chunk
+                    self._scan_pos = pos
+                    return None
+                pos = match.end()
+                self._in_string = False
+                if self._depth == 0:
+                    return pos
+                continue
+            match = _STRUCTURE.search(buffer, pos)
+            if match is None:
+                self._scan_pos = len(buffer)
+                return None
+            char = match.group()
+            pos = match.end()
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    return pos
+
+    def _close_object(self):
+        if self._level == 0:
+            self._state = "end"
+        else:
+            self._level -= 1
+            self._state = "separator"
+
+    def _advance(self, items: list) -> bool:
+        """
+        Parse next token of the object.
+
+        :return: False if more data is needed
+        """
+        if self._state == "end" or not self._skip_whitespace():
+            return False
+        char = self._buffer[self._pos]
+
+        if self._state == "start":
+            if char != "{":
+                raise ValueError(f"Expected JSON object, got {char!r}")
+            self._pos += 1
+            self._state = "first_key"
+
+        elif self._state in ("first_key", "key"):
+            if char == "}" and self._state == "first_key":
+                self._pos += 1
+                self._close_object()
+                return self._state != "end"
+            if char != '"':
+                raise ValueError(f"Expected object key, got {char!r}")
+            try:
+                self._key, self._pos = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                return False
+            self._state = "colon"
+
+        elif self._state == "colon":
+            if char != ":":
+                raise ValueError(f"Expected ':', got {char!r}")
+            self._pos += 1
+            self._state = "value"
+
+        elif self._state == "value":
+            if self._level < len(self.root) and self._key == self.root[self._level]:
+                if char != "{":
+                    raise ValueError(f"Expected JSON object at {self._key!r}, got {char!r}")
+                self._pos += 1
+                self._level += 1
+                self._state = "first_key"
+                return True
+            if self._level == len(self.root) and self._scan_pos is None:
+                # Most members are small and already complete, decoding them at once is the
+                # fastest, a failed attempt falls back to scanning of the value for its end
+                try:
+                    value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                except json.JSONDecodeError:
+                    end = None
+                if end is not None and end < len(self._buffer) and self._buffer[end] in _DELIMITERS:
+                    self._pos = end
+                    items.append((self._key, value))
+                    self._state = "separator"
+                    return True
+            end = self._scan_value()
+            if end is None:
+                return False
+            if self._level == len(self.root):
+                value, self._pos = self._decoder.raw_decode(self._buffer, self._pos)
+                items.append((self._key, value))
+            else:
+                # Members outside of the root are skipped without decoding
+                self._pos = end
+            self._scan_pos = None
+            self._state = "separator"
+
+        elif self._state == "separator":
+            self._pos += 1
+            if char == ",":
+                self._state = "key"
+            elif char == "}":
+                self._close_object()
+            else:
+                raise ValueError(f"Expected ',' or '}}', got {char!r}")
+
+        return True
@@ -0,0 +1,102 @@
+import time
+from typing import Optional, Union
+
+from httpx import Timeout
+
+from .exceptions import DeadlineExceeded
+
+
+DEFAULT_TIMEOUT = 30.0
+
+
+# Timeout of a single request attempt per endpoint, in seconds
+TIMEOUT_PROFILES = {
+    "trades/allRates": 10.0,
+    "trades/destinationsList": 10.0,
+    "trades/ratesInDirection": 10.0,
+    "trades/getInfo": 5.0,
+    "trades/createTrade": 30.0,
+    "trades/cancelTrade": 15.0,
+    "trades/changeCredentials": 15.0,
+    "trades/emulatePayment": 15.0,
+}
+
+
+def make_deadline(timeout: Optional[float]) -> Optional[float]:
+    """
+    Convert total time limit of a call to an absolute deadline.
+
+    :param timeout: Total time limit in seconds, None means no limit
+    :return: Deadline in time.monotonic() seconds or None
+    """
+    if timeout is None:
+        return None
+    return time.monotonic() + timeout
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """
+    Time left until the deadline.
+
+    :param deadline: Deadline in time.monotonic() seconds or None
+    :return: Seconds left or None if there is no deadline
+    :raises DeadlineExceeded: If the deadline has already passed.
+    """
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded
+    return left
+
+
+def bound_timeout(
+    timeout: Union[Timeout, float, None],
+    deadline: Optional[float]
+) -> Union[Timeout, float, None]:
+    """
+    Limit timeout of a single attempt so it doesn't outlive the deadline.
+
+    :param timeout: Timeout of the attempt
+    :param deadline: Deadline in time.monotonic() seconds or None
+    :return: Timeout which ends no later than the deadline
+    :raises DeadlineExceeded: If the deadline has already passed.
+    """
+    left = remaining(deadline)
+    if left is None:
+        return timeout
+    if timeout is None:
+        return left
+    if isinstance(timeout, Timeout):
+        return Timeout(
+            connect=_min(timeout.connect, left),
+            read=_min(timeout.read, left),
+            write=_min(timeout.write, left),
+            pool=_min(timeout.pool, left)
+        )
+    return min(timeout, left)
+
+
+def is_bounded(
+    timeout: Union[Timeout, float, None],
+    deadline: Optional[float]
+) -> bool:
+    """
+    Whether bound_timeout shortens timeout, so a timeout of the attempt
+    may be caused by the deadline of the caller, not by the server.
+
+    :param timeout: Timeout of the attempt
+    :param deadline: Deadline in time.monotonic() seconds or None
+    """
+    if deadline is None:
+        return False
+    left = deadline - time.monotonic()
+    if isinstance(timeout, Timeout):
+        values = (timeout.connect, timeout.read, timeout.write, timeout.pool)
+    else:
+        values = (timeout,)
+    return any(value is None or value > left for value in values)
+
+
+def _min(value: Optional[float], limit: float) -> float:
+    return limit if value is None else min(value, limit)
@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    from opentelemetry import propagate, trace
+    OPENTELEMETRY_INSTALLED = True
+except ImportError:
+    OPENTELEMETRY_INSTALLED = False
+
+
+TRACER_NAME = "yellow_changer_api"
+
+
+@contextmanager
+def start_span(name: str, attributes: Optional[dict] = None, client: bool = False):
+    """
+    Start span which is current inside the block.
+
+    Does nothing if opentelemetry-api is not installed.
+    Exceptions raised inside the block are recorded on the span.
+
+    :param name: Name of the span
+    :param attributes: Attributes of the span, None values are skipped
+    :param client: Span of an outgoing request (SpanKind.CLIENT)
+    :return: Span or None
+    """
+    if not OPENTELEMETRY_INSTALLED:
+        yield None
+        return
+    tracer = trace.get_tracer(TRACER_NAME)
+    kind = trace.SpanKind.CLIENT if client else trace.SpanKind.INTERNAL
+    with tracer.start_as_current_span(name, kind=kind) as span:
+        set_attributes(span, attributes)
+        yield span
+
+
+def current_span():
+    """
+    Span current in the context, e.g. the span of the call around request attempts.
+
+    :return: Span or None if opentelemetry-api is not installed
+    """
+    if not OPENTELEMETRY_INSTALLED:
+        return None
+    return trace.get_current_span()
+
+
+def set_attributes(span, attributes: Optional[dict]):
+    """
+    Set attributes of a span returned by start_span, None values are skipped.
+    """
+    if span is None or not attributes:
+        return
+    for key, value in attributes.items():
+        if value is not None:
+            span.set_attribute(key, value)
+
+
+def inject_context(headers: Optional[dict]) -> Optional[dict]:
+    """
+    Add trace context of the current span to request headers.
+
+    :param headers: Request headers, not modified
+    :return: Copy of headers with trace context (e.g. traceparent)
+    """
+    if not OPENTELEMETRY_INSTALLED:
+        return headers
+    headers = dict(headers or {})
+    propagate.inject(headers)
+    return headers
+
+
+def trade_id(body: Optional[dict], response=None) -> Optional[str]:
+    """
+    uniq_id of the trade from request body or response, for span attributes.
+    """
+    for source in (body, response):
+        if isinstance(source, dict):
+            uniq_id = source.get("uniq_id") or source.get("uniqId")
+            if uniq_id:
+                return str(uniq_id)
+    return None
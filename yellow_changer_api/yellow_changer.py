@@ -1,12 +1,59 @@
+import asyncio
 import hashlib
 import hmac
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Union
 import requests
 import httpx
+import urllib3
+from requests.adapters import HTTPAdapter
 
-from .exceptions import BadRequest, UnsupportedBank, UnsupportedMemo
+from .endpoints import EndpointSelector, is_endpoint_failure
+from .exceptions import BadRequest, DeadlineExceeded, UnsupportedBank, UnsupportedMemo
 from .validations import BANKS, format_number
 from .http_client import HTTPClient
+from .hedging import HedgePolicy
+from .preflight import PreflightValidator
+from .scheduling import ENDPOINT_PRIORITIES, Priority, PriorityScheduler, current_priority
+from .streaming import ACCEPT_ENCODING, JSONObjectStream
+from .tracing import inject_context, set_attributes, start_span, trade_id
+from .timeouts import DEFAULT_TIMEOUT, TIMEOUT_PROFILES, make_deadline, remaining
+
+
+def _root_keys(root: Union[str, tuple, None]) -> tuple:
+    if root is None:
+        return ()
+    if isinstance(root, str):
+        return (root,)
+    return tuple(root)
+
+
+def _iter_body(response: requests.Response, chunk_size: int, deadline: Optional[float]):
+    """
+    Decoded chunks of a streamed response, received no later than the deadline.
+
+    Timeouts of requests bound every read, not the whole body,
+    so the deadline is checked between reads.
+
+    :raises DeadlineExceeded: If the deadline passed before the body was received.
+    """
+    read1 = getattr(response.raw, "read1", None)
+    if read1 is None:
+        # urllib3 < 2 waits for the whole chunk, so a slow body is cut off later
+        chunks = response.iter_content(chunk_size)
+    else:
+        chunks = iter(lambda: read1(chunk_size, decode_content=True), b"")
+    try:
+        for chunk in chunks:
+            remaining(deadline)
+            yield chunk
+    except urllib3.exceptions.ReadTimeoutError as err:
+        raise requests.exceptions.ReadTimeout(err)
+    except urllib3.exceptions.HTTPError as err:
+        raise requests.exceptions.ConnectionError(err)
 
 
 class YellowChanger():
@@ -14,23 +61,176 @@ class YellowChanger():
         self,
         public_api_key: str,
         secret_api_key: str,
-        base_url: Union[None, str] = None
+        base_url: Union[None, str, list] = None,
+        timeouts: Union[dict, None] = None,
+        pool_size: int = 10,
+        max_workers: Union[int, None] = None,
+        preflight: Union[PreflightValidator, None] = None
     ):
         """
         All you need to pass only public_api_key and secret_api_key
 
         :param public_api_key: Public API Key obtained from https://yellowchanger.com/auth/register
         :param secret_api_key: Secret API Key obtained from https://yellowchanger.com/auth/register
-        :param base_url: BaseURL of API, if domain will be changed
+        :param base_url: BaseURL of API, if domain will be changed, or list of
+            BaseURLs (e.g. regional mirrors), every request goes to the fastest
+            healthy one and fails over to the next one, see EndpointSelector
+        :param timeouts: Request timeouts in seconds per endpoint path,
+            overrides TIMEOUT_PROFILES, for example {"trades/createTrade": 60}
+        :param pool_size: Maximum number of pooled connections kept open
+        :param max_workers: Number of threads used by batch methods
+            (get_info_many, cancel_trades, rates_in_directions), pool_size by default
+        :param preflight: Optional PreflightValidator, create_trade rejects
+            impossible trades locally, see load_preflight
         """
         self.public_api_key = public_api_key
         self.secret_api_key = secret_api_key
+        self.timeouts = {**TIMEOUT_PROFILES, **(timeouts or {})}
+        self.preflight = preflight
         self.base_headers = {
             "Content-Type": "application/json",
+            "Accept-Encoding": ACCEPT_ENCODING,
             "Y_API_KEY": self.public_api_key
         }
-        if not base_url:
-            self.base_url = "https://api.yellowchanger.com/"
+        self.endpoints = EndpointSelector(base_url)
+        self.max_workers = max_workers or pool_size
+        # Every batch worker should be able to keep its own pooled connection
+        self.pool_size = max(pool_size, self.max_workers)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor: Union[ThreadPoolExecutor, None] = None
+        self._executor_lock = threading.Lock()
+        self._keepalive_thread: Union[threading.Thread, None] = None
+        self._keepalive_stop = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """
+        Close pooled connections when exiting context.
+        """
+        self.close()
+
+    @property
+    def base_url(self) -> str:
+        return self.endpoints.primary
+
+    @base_url.setter
+    def base_url(self, base_url: Union[str, list]):
+        self.endpoints = EndpointSelector(base_url)
+
+    def close(self):
+        """
+        Stop keep-alive thread, batch thread pool and close pooled connections.
+        """
+        self.stop_keepalive()
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self.session.close()
+
+    def __get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="yellowchanger"
+                )
+            return self._executor
+
+    def __map(self, func, items, timeout: Union[float, None] = None) -> list:
+        """
+        Call func for every item in the shared thread pool.
+
+        :param func: Method called as func(item, timeout=...)
+        :param items: Items to process
+        :param timeout: Total time limit of all calls in seconds
+        :return: Results in order of items, failed items hold the raised exception
+        """
+        deadline = make_deadline(timeout)
+
+        def call(item):
+            return func(item, timeout=remaining(deadline))
+
+        executor = self.__get_executor()
+        futures = [executor.submit(call, item) for item in items]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as err:
+                results.append(err)
+        return results
+
+    def __ping(self, url: str) -> bool:
+        try:
+            self.session.head(
+                url,
+                timeout=self.timeouts.get("trades/destinationsList", DEFAULT_TIMEOUT)
+            )
+        except requests.exceptions.RequestException:
+            return False
+        return True
+
+    def warmup(self, n_connections: int = 1) -> int:
+        """
+        Open pooled connections to every BaseURL ahead of time,
+        so first requests don't pay for DNS, TCP and TLS setup.
+
+        Connections above pool_size are not kept in the pool.
+
+        :param n_connections: Number of connections to open per BaseURL
+        :return: Number of connections opened successfully
+        """
+        urls = [endpoint.base_url for endpoint in self.endpoints.endpoints] * n_connections
+        if not urls:
+            return 0
+        with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+            results = list(executor.map(self.__ping, urls))
+        return sum(results)
+
+    def start_keepalive(self, interval: float = 30.0, n_connections: int = 1):
+        """
+        Start background thread which sends light requests (destinations_list),
+        so idle pooled connections aren't closed by the server.
+
+        :param interval: Delay between keep-alive rounds in seconds
+        :param n_connections: Number of concurrent requests per round
+        """
+        if self._keepalive_thread is not None and self._keepalive_thread.is_alive():
+            return
+        self._keepalive_stop = threading.Event()
+        self._keepalive_thread = threading.Thread(
+            target=self.__keepalive,
+            args=(interval, n_connections, self._keepalive_stop),
+            name="yellowchanger-keepalive",
+            daemon=True
+        )
+        self._keepalive_thread.start()
+
+    def stop_keepalive(self):
+        """
+        Stop background keep-alive thread.
+        """
+        self._keepalive_stop.set()
+        if self._keepalive_thread is not None:
+            self._keepalive_thread.join()
+            self._keepalive_thread = None
+
+    def __keepalive(self, interval: float, n_connections: int, stop: threading.Event):
+        with ThreadPoolExecutor(max_workers=n_connections) as executor:
+            while not stop.wait(interval):
+                futures = [
+                    executor.submit(self.destinations_list)
+                    for _ in range(n_connections)
+                ]
+                for future in futures:
+                    # Keep-alive failures are not fatal, next round will retry
+                    future.exception()
 
     def __create_hmac_sha256(self, data: dict, secret_key: str):
         """
@@ -53,7 +253,9 @@ class YellowChanger():
         self,
         method: str,
         path: str,
-        body: Union[dict, None] = None
+        body: Union[dict, None] = None,
+        timeout: Union[float, None] = None,
+        stream: bool = False
     ) -> requests.Response:
         """
         Base request method.
@@ -62,49 +264,120 @@ class YellowChanger():
         :param method: 'GET' or 'POST'
         :param path: path to endpoint
         :param body: body of request
+        :param timeout: total time limit of the call in seconds
+        :param stream: don't read the body of response in advance,
+            the caller reads it with _iter_body
         :return: requests.Response
         """
         headers = self.base_headers.copy()
-        url = self.base_url + path
-
-        try:
-            if method.upper() == "POST":
-                if body is None:
-                    raise ValueError("Body of POST request is empty!")
-
-                signature = self.__create_hmac_sha256(
-                    body, self.secret_api_key)
-                headers["Signature"] = signature
-                response = requests.post(url, headers=headers, json=body)
+        deadline = make_deadline(timeout)
+
+        with start_span(f"YellowChanger.{path.rsplit('/', 1)[-1]}", {
+            "yellowchanger.endpoint": path,
+            "yellowchanger.uniq_id": trade_id(body),
+        }) as span:
+            bounded_by_deadline = False
+            try:
+                if method.upper() == "POST":
+                    if body is None:
+                        raise ValueError("Body of POST request is empty!")
 
-            elif method.upper() == "GET":
-                if body:
                     signature = self.__create_hmac_sha256(
                         body, self.secret_api_key)
                     headers["Signature"] = signature
-                response = requests.get(url, headers=headers, json=body)
-
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
 
-        except requests.exceptions.HTTPError as http_err:
-            raise BadRequest(f"HTTP error occurred: {http_err}")
-
-        except Exception as err:
-            raise BadRequest(f"An error occurred: {err}")
+                elif method.upper() == "GET":
+                    if body:
+                        signature = self.__create_hmac_sha256(
+                            body, self.secret_api_key)
+                        headers["Signature"] = signature
 
-        if not str(response.status_code).startswith("20"):
-            raise BadRequest(
-                f"Http status code {response.status_code}: {response.text}"
-            )
+                else:
+                    raise ValueError(f"Unsupported HTTP method: {method}")
 
-        return response
+                # Sync client doesn't retry, it only fails over to other BaseURLs
+                # if the request couldn't reach the API or the endpoint failed
+                tried = []
+                while True:
+                    endpoint = self.endpoints.select(tried)
+                    tried.append(endpoint)
+                    url = endpoint.base_url + path
+                    # The deadline bounds every attempt
+                    request_timeout = self.timeouts.get(path, DEFAULT_TIMEOUT)
+                    left = remaining(deadline)
+                    bounded_by_deadline = left is not None and left < request_timeout
+                    if bounded_by_deadline:
+                        request_timeout = left
+
+                    started = time.monotonic()
+                    with start_span(
+                        f"HTTP {method.upper()}",
+                        {"http.request.method": method.upper(), "url.full": url, "yellowchanger.attempt": len(tried)},
+                        client=True
+                    ) as attempt_span:
+                        try:
+                            response = self.session.request(
+                                method.upper(),
+                                url,
+                                headers=inject_context(headers),
+                                json=body,
+                                timeout=request_timeout,
+                                # The body is read by _iter_body to keep the deadline
+                                stream=True
+                            )
+                        except requests.exceptions.RequestException as request_err:
+                            # The endpoint is not to blame for the timeout shortened by the deadline
+                            if not (bounded_by_deadline and isinstance(request_err, requests.exceptions.Timeout)):
+                                self.endpoints.record(endpoint, time.monotonic() - started, True)
+                            if (
+                                isinstance(request_err, requests.exceptions.ConnectionError)
+                                and self.endpoints.has_alternative(tried)
+                            ):
+                                continue
+                            raise
+                        failed = is_endpoint_failure(response.status_code) and not response.ok
+                        self.endpoints.record(endpoint, time.monotonic() - started, failed)
+                        set_attributes(attempt_span, {"http.response.status_code": response.status_code})
+                    if failed and self.endpoints.has_alternative(tried):
+                        response.close()
+                        continue
+                    break
+
+                if not stream:
+                    with response:
+                        # Let response.json() and response.text use the received body
+                        response._content = b"".join(_iter_body(response, 65536, deadline))
+                        response._content_consumed = True
+
+            except DeadlineExceeded:
+                raise
+
+            except requests.exceptions.Timeout as timeout_err:
+                if bounded_by_deadline:
+                    raise DeadlineExceeded(f"Deadline exceeded: {timeout_err}")
+                raise BadRequest(f"HTTP error occurred: {timeout_err}")
+
+            except requests.exceptions.HTTPError as http_err:
+                raise BadRequest(f"HTTP error occurred: {http_err}")
+
+            except Exception as err:
+                raise BadRequest(f"An error occurred: {err}")
+
+            set_attributes(span, {"http.response.status_code": response.status_code})
+            if not str(response.status_code).startswith("20"):
+                raise BadRequest(
+                    f"Http status code {response.status_code}: {response.text}",
+                    status_code=response.status_code
+                )
+
+            return response
 
     def all_rates(
         self,
         exch_type: str = "yellow",
         commission_crypto_to_rub: float = 0.5,
-        commission_crypto_to_crypto: float = 0.5
+        commission_crypto_to_crypto: float = 0.5,
+        timeout: Union[float, None] = None
     ):
         """
         commission = additional commission in percent which is considered
@@ -118,6 +391,7 @@ class YellowChanger():
         Gets all rates
 
         https://docs.yellowchanger.com/allRates
+        :param timeout: Total time limit of the call in seconds
         :return: Dictionary with all possible exchange rates
         """
 
@@ -126,26 +400,91 @@ class YellowChanger():
             "commission_crypto_to_rub": commission_crypto_to_rub,
             "commission_crypto_to_crypto": commission_crypto_to_crypto
         }
-        response = self.__fetch("GET", "trades/allRates", body)
+        response = self.__fetch("GET", "trades/allRates", body, timeout=timeout)
         return response.json()
 
-    def destinations_list(self):
+    def iter_all_rates(
+        self,
+        exch_type: str = "yellow",
+        commission_crypto_to_rub: float = 0.5,
+        commission_crypto_to_crypto: float = 0.5,
+        timeout: Union[float, None] = None,
+        chunk_size: int = 65536,
+        root: Union[str, tuple, None] = None
+    ):
+        """
+        Gets all rates, parsing the response as it arrives,
+        see all_rates for details
+
+        Memory usage doesn't depend on the size of the rate table,
+        rates may be put directly to a caller's structure:
+        rates.update(yellow_changer.iter_all_rates())
+
+        https://docs.yellowchanger.com/allRates
+        :param timeout: Total time limit of the whole iteration in seconds,
+            including time spent by the caller between rates
+        :param chunk_size: Size of chunks read from the response
+        :param root: Key (or tuple of keys) of the nested object holding the rates,
+            e.g. "data" for {"data": {...}}, members of the response by default
+        :return: Iterator of (pair, rate) members of the allRates response
+        """
+        body = {
+            "exch_type": exch_type,
+            "commission_crypto_to_rub": commission_crypto_to_rub,
+            "commission_crypto_to_crypto": commission_crypto_to_crypto
+        }
+        deadline = make_deadline(timeout)
+        response = self.__fetch("GET", "trades/allRates", body, timeout=timeout, stream=True)
+        with response:
+            parser = JSONObjectStream(_root_keys(root))
+            try:
+                for chunk in _iter_body(response, chunk_size, deadline):
+                    yield from parser.feed(chunk)
+                parser.close()
+            except (requests.exceptions.RequestException, ValueError) as err:
+                raise BadRequest(f"An error occurred: {err}")
+
+    def destinations_list(self, timeout: Union[float, None] = None):
         """
         Gets all destinations list
 
         https://docs.yellowchanger.com/destinationsList
 
+        :param timeout: Total time limit of the call in seconds
         :return: Dictionary with all possible exchange destinations
         """
-        response = self.__fetch("GET", "trades/destinationsList")
+        response = self.__fetch("GET", "trades/destinationsList", timeout=timeout)
         return response.json()
 
+    def load_preflight(self, timeout: Union[float, None] = None) -> PreflightValidator:
+        """
+        Build pre-flight index from destinations_list() and all_rates(),
+        after that create_trade rejects unsupported directions and
+        out of range amounts without a request.
+
+        Call it again to refresh the cached catalog.
+
+        :param timeout: Time limit of each of the two calls in seconds
+        :return: PreflightValidator used by the client
+        :raises ValueError: If no direction was found in the catalog,
+            e.g. its format changed; the previous index is kept then.
+        """
+        preflight = PreflightValidator.from_catalog(
+            self.destinations_list(timeout=timeout),
+            self.all_rates(timeout=timeout)
+        )
+        if not preflight.directions:
+            raise ValueError("No exchange directions found in the catalog")
+        self.preflight = preflight
+        return self.preflight
+
     def rates_in_direction(
         self,
         direction: str,
         exch_type: str = "yellow",
         commission_crypto_to_rub: float = 0.5,
-        commission_crypto_to_crypto: float = 0.5
+        commission_crypto_to_crypto: float = 0.5,
+        timeout: Union[float, None] = None
     ):
         """
         commission = additional commission in percent which is considered
@@ -161,6 +500,7 @@ class YellowChanger():
         https://docs.yellowchanger.com/ratesInDirection
 
         :param direction: direction of rate, for example: 'USDT'
+        :param timeout: Total time limit of the call in seconds
         :return: Dictionary with rates in a certain direction
         """
         body = {
@@ -169,20 +509,21 @@ class YellowChanger():
             "commission_crypto_to_rub": commission_crypto_to_rub,
             "commission_crypto_to_crypto": commission_crypto_to_crypto
         }
-        response = self.__fetch("GET", "trades/ratesInDirection", body)
+        response = self.__fetch("GET", "trades/ratesInDirection", body, timeout=timeout)
         return response.json()
 
-    def get_info(self, uniq_id: str):
+    def get_info(self, uniq_id: str, timeout: Union[float, None] = None):
         """
         Gets information about trade by uniq_id of trade
 
         https://docs.yellowchanger.com/getInfo
 
         :param uniq_id: uniq_id of trade
+        :param timeout: Total time limit of the call in seconds
         :return: Dictionary with all information about transaction
         """
         body = {"uniq_id": uniq_id}
-        response = self.__fetch("GET", "trades/getInfo", body)
+        response = self.__fetch("GET", "trades/getInfo", body, timeout=timeout)
         return response.json()
 
     def create_trade(
@@ -200,7 +541,8 @@ class YellowChanger():
         sbpBank: Union[str, None] = None,
         memo: Union[str, None] = None,
         recipientName: Union[str, None] = None,
-        testMode: Union[int, None] = None
+        testMode: Union[int, None] = None,
+        timeout: Union[float, None] = None
     ):
         """
         Creates a new trade via the YellowChanger API.
@@ -235,10 +577,22 @@ class YellowChanger():
         :param memo: Optional note/memo.
         :param recipientName: Optional recipient's name.
         :param testMode: Optional test mode (1 or 0). Allows emulating exchange without payment.
+        :param timeout: Total time limit of the call in seconds
 
         :return: Dictionary with API response data about the created trade.
+        :raises UnsupportedDirection: If preflight is loaded and the direction is not supported.
+        :raises AmountOutOfRange: If preflight is loaded and the amount is out of limits.
         """
 
+        if self.preflight is not None:
+            self.preflight.check(
+                send_name,
+                send_network,
+                get_name,
+                get_network,
+                send_value=send_value,
+                get_value=get_value
+            )
         body = {
             "send_name": send_name,
             "get_name": get_name,
@@ -268,22 +622,29 @@ class YellowChanger():
             if testMode not in [0, 1]:
                 raise ValueError("testMode должен быть 0 или 1")
             body["testMode"] = testMode
-        response = self.__fetch("POST", "trades/createTrade", body)
+        response = self.__fetch("POST", "trades/createTrade", body, timeout=timeout)
         return response.json()
 
-    def cancel_trade(self, uniq_id: str):
+    def cancel_trade(self, uniq_id: str, timeout: Union[float, None] = None):
         """
         Cancels a exchange by its unique ID.
         For details, see: https://docs.yellowchanger.com/cancelTrade
 
         :param uniq_id: Unique ID of the trade to cancel.
+        :param timeout: Total time limit of the call in seconds
         :return: Dictionary with API response data about the canceled trade.
         """
         body = {"uniq_id": uniq_id}
-        response = self.__fetch("POST", "trades/cancelTrade", body)
+        response = self.__fetch("POST", "trades/cancelTrade", body, timeout=timeout)
         return response.json()
 
-    def change_credentials(self, uniq_id: str, get_creds: str, sbpBank: str = None):
+    def change_credentials(
+        self,
+        uniq_id: str,
+        get_creds: str,
+        sbpBank: str = None,
+        timeout: Union[float, None] = None
+    ):
         """
         Changes the receiving credentials for a trade by its unique ID.
         For details, see: https://docs.yellowchanger.com/changeCredentials
@@ -291,6 +652,7 @@ class YellowChanger():
         :param uniq_id: Unique ID of the trade to change credentials for.
         :param get_creds: New receiving credentials (address/card/etc.).
         :param sbpBank: Optional bank name for SBP if receiving RUB via SBP.
+        :param timeout: Total time limit of the call in seconds
         :return: Dictionary with API response data about the changed credentials.
         """
         body = {"uniq_id": str(uniq_id), "get_creds": str(get_creds)}
@@ -299,7 +661,7 @@ class YellowChanger():
                 body["sbpBank"] = str(sbpBank)
             else:
                 raise UnsupportedBank
-        response = self.__fetch("POST", "trades/changeCredentials", body)
+        response = self.__fetch("POST", "trades/changeCredentials", body, timeout=timeout)
         return response.json()
 
     def emulate_payment(
@@ -308,7 +670,8 @@ class YellowChanger():
         paidAmount: str,
         withdrawStatus: str,
         depositStatus: str,
-        isInvalidRequisites: int
+        isInvalidRequisites: int,
+        timeout: Union[float, None] = None
     ):
         """
         Emulates a payment for a trade by its unique ID.
@@ -329,6 +692,7 @@ class YellowChanger():
             - amlblock: AML block
             - wait_pay: waiting for payment
         :param isInvalidRequisites: Emulates invalid credentials provided (1 or 0)
+        :param timeout: Total time limit of the call in seconds
         :return: Dictionary with API response data about the emulated payment
         """
         body = {
@@ -338,32 +702,225 @@ class YellowChanger():
             "depositStatus": depositStatus,
             "isInvalidRequisites": isInvalidRequisites
         }
-        response = self.__fetch("POST", "trades/emulatePayment", body)
+        response = self.__fetch("POST", "trades/emulatePayment", body, timeout=timeout)
         return response.json()
 
+    def get_info_many(self, uniq_ids: list, timeout: Union[float, None] = None) -> list:
+        """
+        Gets information about many trades in parallel
+
+        Requests are sent from the shared thread pool over pooled connections.
+
+        :param uniq_ids: uniq_id of every trade
+        :param timeout: Total time limit of all calls in seconds
+        :return: List in order of uniq_ids with information about transaction
+            or exception (BadRequest, DeadlineExceeded) if the request failed
+        """
+        return self.__map(self.get_info, uniq_ids, timeout=timeout)
+
+    def cancel_trades(self, uniq_ids: list, timeout: Union[float, None] = None) -> list:
+        """
+        Cancels many exchanges in parallel
+
+        Requests are sent from the shared thread pool over pooled connections.
+
+        :param uniq_ids: Unique IDs of the trades to cancel
+        :param timeout: Total time limit of all calls in seconds
+        :return: List in order of uniq_ids with API response data about the canceled trade
+            or exception (BadRequest, DeadlineExceeded) if the request failed
+        """
+        return self.__map(self.cancel_trade, uniq_ids, timeout=timeout)
+
+    def rates_in_directions(
+        self,
+        directions: list,
+        exch_type: str = "yellow",
+        commission_crypto_to_rub: float = 0.5,
+        commission_crypto_to_crypto: float = 0.5,
+        timeout: Union[float, None] = None
+    ) -> list:
+        """
+        Gets rates in many directions in parallel,
+        see rates_in_direction for details
+
+        :param directions: directions of rate, for example: ['USDT', 'BTC']
+        :param timeout: Total time limit of all calls in seconds
+        :return: List in order of directions with rates in a certain direction
+            or exception (BadRequest, DeadlineExceeded) if the request failed
+        """
+        def rates(direction, timeout=None):
+            return self.rates_in_direction(
+                direction,
+                exch_type=exch_type,
+                commission_crypto_to_rub=commission_crypto_to_rub,
+                commission_crypto_to_crypto=commission_crypto_to_crypto,
+                timeout=timeout
+            )
+
+        return self.__map(rates, directions, timeout=timeout)
+
 
 class AsyncYellowChanger():
     def __init__(
         self,
         public_api_key: str,
         secret_api_key: str,
-        base_url: Optional[str] = None
+        base_url: Union[None, str, list] = None,
+        hedge_policy: Optional[HedgePolicy] = None,
+        timeouts: Optional[dict] = None,
+        limits: Optional[httpx.Limits] = None,
+        preflight: Optional[PreflightValidator] = None,
+        http2: bool = False,
+        coalesce: bool = False,
+        max_concurrency: Optional[int] = None,
+        reserved_slots: int = 1,
+        priorities: Optional[dict] = None
     ):
         """
         All you need to pass only public_api_key and secret_api_key
 
         :param public_api_key: Public API Key obtained from yellowchanger.com
         :param secret_api_key: Secret API Key obtained from yellowchanger.com
-        :param base_url: BaseURL of API, if domain will be changed
+        :param base_url: BaseURL of API, if domain will be changed, or list of
+            BaseURLs (e.g. regional mirrors), every request goes to the fastest
+            healthy one and fails over to the next one, see EndpointSelector
+        :param hedge_policy: Optional HedgePolicy, enables hedged requests
+            for GET endpoints
+        :param timeouts: Timeouts of a single attempt in seconds per endpoint
+            path, overrides TIMEOUT_PROFILES, for example {"trades/createTrade": 60}
+        :param limits: Connection pool limits of the shared httpx client
+        :param preflight: Optional PreflightValidator, create_trade rejects
+            impossible trades locally, see load_preflight
+        :param http2: Enable HTTP/2 multiplexing, requires h2 package
+        :param coalesce: Share one in-flight request between identical
+            concurrent GET calls, callers receive the same response object
+        :param max_concurrency: Maximum number of requests in flight, enables
+            priority scheduling of requests, None means no limit
+        :param reserved_slots: Slots of max_concurrency kept for HIGH priority requests
+        :param priorities: Priority per endpoint path, overrides ENDPOINT_PRIORITIES,
+            for example {"trades/getInfo": Priority.HIGH}
         """
         self.public_api_key = public_api_key
         self.secret_api_key = secret_api_key
+        self.hedge_policy = hedge_policy
+        self.http2 = http2
+        self.coalesce = coalesce
+        self.timeouts = {**TIMEOUT_PROFILES, **(timeouts or {})}
+        self.preflight = preflight
+        self.priorities = {**ENDPOINT_PRIORITIES, **(priorities or {})}
+        self.scheduler = None
+        if max_concurrency is not None:
+            self.scheduler = PriorityScheduler(max_concurrency, reserved=reserved_slots)
+            # The scheduler, not the connection pool, should decide who waits
+            limits = limits or httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency
+            )
+        self.limits = limits
         self.base_headers = {
             "Content-Type": "application/json",
+            "Accept-Encoding": ACCEPT_ENCODING,
             "Y_API_KEY": self.public_api_key
         }
-        if not base_url:
-            self.base_url = "https://api.yellowchanger.com/"
+        self.endpoints = EndpointSelector(base_url)
+        self._http_client: Optional[HTTPClient] = None
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self._inflight = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        Close pooled connections when exiting context.
+        """
+        await self.close()
+
+    @property
+    def base_url(self) -> str:
+        return self.endpoints.primary
+
+    @base_url.setter
+    def base_url(self, base_url: Union[str, list]):
+        self.endpoints = EndpointSelector(base_url)
+
+    def __get_client(self) -> HTTPClient:
+        """
+        Shared HTTP client, so connections are pooled between requests.
+        """
+        if self._http_client is None or self._http_client.session.is_closed:
+            self._http_client = HTTPClient(
+                limits=self.limits,
+                http2=self.http2,
+                scheduler=self.scheduler
+            )
+        return self._http_client
+
+    async def close(self):
+        """
+        Stop keep-alive task and close pooled connections.
+        """
+        await self.stop_keepalive()
+        if self._http_client is not None:
+            await self._http_client.close()
+            self._http_client = None
+
+    async def warmup(self, n_connections: int = 1) -> int:
+        """
+        Open pooled connections to every BaseURL ahead of time,
+        so first requests don't pay for DNS, TCP and TLS setup.
+
+        :param n_connections: Number of connections to open per BaseURL
+        :return: Number of connections opened successfully
+        """
+        client = self.__get_client()
+        results = await asyncio.gather(*(
+            client.warmup(
+                endpoint.base_url,
+                n_connections=n_connections,
+                timeout=self.timeouts.get("trades/destinationsList", DEFAULT_TIMEOUT)
+            )
+            for endpoint in self.endpoints.endpoints
+        ))
+        return sum(results)
+
+    def start_keepalive(self, interval: float = 4.0, n_connections: int = 1):
+        """
+        Start background task which sends light requests (destinations_list),
+        so idle pooled connections don't expire.
+
+        httpx closes connections idle for more than 5 seconds by default,
+        so interval should be below keepalive_expiry of limits.
+
+        :param interval: Delay between keep-alive rounds in seconds
+        :param n_connections: Number of concurrent requests per round
+        """
+        if self._keepalive_task is not None and not self._keepalive_task.done():
+            return
+        self._keepalive_task = asyncio.ensure_future(
+            self.__keepalive(interval, n_connections)
+        )
+
+    async def stop_keepalive(self):
+        """
+        Stop background keep-alive task.
+        """
+        task, self._keepalive_task = self._keepalive_task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def __keepalive(self, interval: float, n_connections: int):
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.gather(
+                *(self.destinations_list() for _ in range(n_connections)),
+                return_exceptions=True
+            )
 
     def __create_hmac_sha256(self, data: dict, secret_key: str):
         """
@@ -381,11 +938,44 @@ class AsyncYellowChanger():
 
         return signature
 
+    async def __coalesced(self, path: str, body: Optional[dict], send, deadline: Optional[float]):
+        """
+        Share one in-flight GET request between identical concurrent calls.
+
+        Every caller waits no longer than its own deadline,
+        the shared request is not cancelled when a caller gives up.
+
+        :param path: path to endpoint
+        :param body: body of request
+        :param send: factory of the request coroutine
+        :param deadline: deadline of the caller in time.monotonic() seconds
+        :return: Response in JSON format
+        """
+        key = (path, json.dumps(body, sort_keys=True, default=str))
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(send())
+            self._inflight[key] = future
+
+            def forget(done):
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+                # Mark the error as retrieved, if every caller has given up
+                if not done.cancelled():
+                    done.exception()
+
+            future.add_done_callback(forget)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), remaining(deadline))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded
+
     async def __fetch(
         self,
         method: str,
         path: str,
-        body: Optional[dict] = None
+        body: Optional[dict] = None,
+        timeout: Optional[float] = None
     ) -> httpx.Response:
         """
         Base request method.
@@ -394,13 +984,20 @@ class AsyncYellowChanger():
         :param method: 'GET' or 'POST'
         :param path: path to endpoint
         :param body: body of request
+        :param timeout: total time limit of the call in seconds, including retries
         :return: httpx.Response
         """
         headers = self.base_headers.copy()
-        url = self.base_url + path
-
-        try:
-            async with HTTPClient() as client:
+        deadline = make_deadline(timeout)
+        request_timeout = self.timeouts.get(path, DEFAULT_TIMEOUT)
+        priority = current_priority(self.priorities.get(path, Priority.NORMAL))
+
+        with start_span(f"YellowChanger.{path.rsplit('/', 1)[-1]}", {
+            "yellowchanger.endpoint": path,
+            "yellowchanger.uniq_id": trade_id(body),
+        }) as span:
+            try:
+                client = self.__get_client()
                 if method.upper() == "POST":
                     if body is None:
                         raise ValueError("Body of POST request is empty!")
@@ -409,7 +1006,13 @@ class AsyncYellowChanger():
                         body, self.secret_api_key)
                     headers["Signature"] = signature
                     response = await client.post(
-                        url, headers=headers, json=body
+                        path,
+                        headers=headers,
+                        json=body,
+                        timeout=request_timeout,
+                        deadline=deadline,
+                        priority=priority,
+                        endpoints=self.endpoints
                     )
 
                 elif method.upper() == "GET":
@@ -417,40 +1020,78 @@ class AsyncYellowChanger():
                         signature = self.__create_hmac_sha256(
                             body, self.secret_api_key)
                         headers["Signature"] = signature
-                        response = await client.get_json(
-                            url, headers=headers, json_body=body
-                        )
+
+                        def request(request_deadline):
+                            return client.get_json(
+                                path,
+                                headers=headers,
+                                json_body=body,
+                                timeout=request_timeout,
+                                deadline=request_deadline,
+                                priority=priority,
+                                endpoints=self.endpoints
+                            )
+                    else:
+                        def request(request_deadline):
+                            return client.get(
+                                path,
+                                headers=headers,
+                                timeout=request_timeout,
+                                deadline=request_deadline,
+                                priority=priority,
+                                endpoints=self.endpoints
+                            )
+
+                    # GET endpoints are idempotent, so they are safe to hedge and coalesce
+                    def send(request_deadline):
+                        if self.hedge_policy is not None:
+                            return self.hedge_policy.run(lambda: request(request_deadline))
+                        return request(request_deadline)
+
+                    if self.coalesce:
+                        # The shared request is bound only by the endpoint timeouts,
+                        # every caller waits for it no longer than its own deadline
+                        response = await self.__coalesced(path, body, lambda: send(None), deadline)
                     else:
-                        response = await client.get(url, headers=headers)
+                        response = await send(deadline)
 
                 else:
                     raise ValueError(f"Unsupported HTTP method: {method}")
 
+                set_attributes(span, {"yellowchanger.uniq_id": trade_id(body, response)})
                 if hasattr(response, 'status_code'):
                     if not str(response.status_code).startswith("20"):
                         raise BadRequest(
-                            f"Http status code {response.status_code}: {response.text}"
+                            f"Http status code {response.status_code}: {response.text}",
+                            status_code=response.status_code
                         )
                     return response
                 else:
                     return response
 
-        except httpx.HTTPError as http_err:
-            raise BadRequest(f"HTTP error occurred: {http_err}")
+            except DeadlineExceeded:
+                raise
 
-        except Exception as err:
-            raise BadRequest(f"An error occurred: {err}")
+            except httpx.HTTPError as http_err:
+                status_code = getattr(http_err, "status_code", None)
+                set_attributes(span, {"http.response.status_code": status_code})
+                raise BadRequest(f"HTTP error occurred: {http_err}", status_code=status_code)
+
+            except Exception as err:
+                raise BadRequest(f"An error occurred: {err}")
 
     async def all_rates(
         self,
         exch_type: str = "yellow",
         commission_crypto_to_rub: float = 0.5,
-        commission_crypto_to_crypto: float = 0.5
+        commission_crypto_to_crypto: float = 0.5,
+        timeout: Optional[float] = None
     ):
         """
         Gets all rates
 
         https://docs.yellowchanger.com/allRates
+        :param timeout: Total time limit of the call in seconds, including retries
         :return: Dictionary with all possible exchange rates
         """
         body = {
@@ -458,31 +1099,134 @@ class AsyncYellowChanger():
             "commission_crypto_to_rub": commission_crypto_to_rub,
             "commission_crypto_to_crypto": commission_crypto_to_crypto
         }
-        response = await self.__fetch("GET", "trades/allRates", body)
+        response = await self.__fetch("GET", "trades/allRates", body, timeout=timeout)
         return response
 
-    async def destinations_list(self):
+    async def iter_all_rates(
+        self,
+        exch_type: str = "yellow",
+        commission_crypto_to_rub: float = 0.5,
+        commission_crypto_to_crypto: float = 0.5,
+        timeout: Optional[float] = None,
+        chunk_size: int = 65536,
+        root: Union[str, tuple, None] = None
+    ):
+        """
+        Gets all rates, parsing the response as it arrives,
+        see all_rates for details
+
+        Memory usage doesn't depend on the size of the rate table and
+        first rates are available before the whole response is received:
+        async for pair, rate in yellow_changer.iter_all_rates(): ...
+
+        https://docs.yellowchanger.com/allRates
+        :param timeout: Total time limit of the whole iteration in seconds, including retries
+            and time spent by the caller between rates
+        :param chunk_size: Size of decompressed chunks fed to the parser
+        :param root: Key (or tuple of keys) of the nested object holding the rates,
+            e.g. "data" for {"data": {...}}, members of the response by default
+        :return: Async iterator of (pair, rate) members of the allRates response
+        """
+        path = "trades/allRates"
+        body = {
+            "exch_type": exch_type,
+            "commission_crypto_to_rub": commission_crypto_to_rub,
+            "commission_crypto_to_crypto": commission_crypto_to_crypto
+        }
+        headers = self.base_headers.copy()
+        headers["Signature"] = self.__create_hmac_sha256(body, self.secret_api_key)
+
+        stream = self.__get_client().stream_items(
+            "GET",
+            path,
+            headers=headers,
+            json=body,
+            timeout=self.timeouts.get(path, DEFAULT_TIMEOUT),
+            deadline=make_deadline(timeout),
+            chunk_size=chunk_size,
+            priority=current_priority(self.priorities.get(path, Priority.NORMAL)),
+            endpoints=self.endpoints,
+            root=_root_keys(root)
+        )
+        try:
+            # As in the synchronous client the span covers the request, not consuming of the body:
+            # every attempt is made before the first rate, after it the span is no longer current
+            with start_span("YellowChanger.allRates", {"yellowchanger.endpoint": path}) as span:
+                try:
+                    first = await stream.__anext__()
+                except StopAsyncIteration:
+                    return
+                except httpx.HTTPError as http_err:
+                    set_attributes(span, {"http.response.status_code": getattr(http_err, "status_code", None)})
+                    raise
+            yield first
+            async for item in stream:
+                yield item
+
+        except DeadlineExceeded:
+            raise
+
+        except httpx.HTTPError as http_err:
+            raise BadRequest(
+                f"HTTP error occurred: {http_err}",
+                status_code=getattr(http_err, "status_code", None)
+            )
+
+        except Exception as err:
+            raise BadRequest(f"An error occurred: {err}")
+
+        finally:
+            await stream.aclose()
+
+    async def destinations_list(self, timeout: Optional[float] = None):
         """
         Gets all destinations list
 
         https://docs.yellowchanger.com/destinationsList
+        :param timeout: Total time limit of the call in seconds, including retries
         :return: Dictionary with all possible exchange destinations
         """
-        response = await self.__fetch("GET", "trades/destinationsList")
+        response = await self.__fetch("GET", "trades/destinationsList", timeout=timeout)
         return response
 
+    async def load_preflight(self, timeout: Optional[float] = None) -> PreflightValidator:
+        """
+        Build pre-flight index from destinations_list() and all_rates(),
+        after that create_trade rejects unsupported directions and
+        out of range amounts without a request.
+
+        Call it again to refresh the cached catalog.
+
+        :param timeout: Total time limit of the calls in seconds, including retries,
+            both calls are sent concurrently
+        :return: PreflightValidator used by the client
+        :raises ValueError: If no direction was found in the catalog,
+            e.g. its format changed; the previous index is kept then.
+        """
+        destinations, rates = await asyncio.gather(
+            self.destinations_list(timeout=timeout),
+            self.all_rates(timeout=timeout)
+        )
+        preflight = PreflightValidator.from_catalog(destinations, rates)
+        if not preflight.directions:
+            raise ValueError("No exchange directions found in the catalog")
+        self.preflight = preflight
+        return self.preflight
+
     async def rates_in_direction(
         self,
         direction: str,
         exch_type: str = "yellow",
         commission_crypto_to_rub: float = 0.5,
-        commission_crypto_to_crypto: float = 0.5
+        commission_crypto_to_crypto: float = 0.5,
+        timeout: Optional[float] = None
     ):
         """
         Gets all rates in specific direction
 
         https://docs.yellowchanger.com/ratesInDirection
         :param direction: direction of rate, for example: 'USDT'
+        :param timeout: Total time limit of the call in seconds, including retries
         :return: Dictionary with rates in a certain direction
         """
         body = {
@@ -491,19 +1235,20 @@ class AsyncYellowChanger():
             "commission_crypto_to_rub": commission_crypto_to_rub,
             "commission_crypto_to_crypto": commission_crypto_to_crypto
         }
-        response = await self.__fetch("GET", "trades/ratesInDirection", body)
+        response = await self.__fetch("GET", "trades/ratesInDirection", body, timeout=timeout)
         return response
 
-    async def get_info(self, uniq_id: str):
+    async def get_info(self, uniq_id: str, timeout: Optional[float] = None):
         """
         Gets information about trade by uniq_id of trade
 
         https://docs.yellowchanger.com/getInfo
         :param uniq_id: uniq_id of trade
+        :param timeout: Total time limit of the call in seconds, including retries
         :return: Dictionary with all information about transaction
         """
         body = {"uniq_id": uniq_id}
-        response = await self.__fetch("GET", "trades/getInfo", body)
+        response = await self.__fetch("GET", "trades/getInfo", body, timeout=timeout)
         return response
 
     async def create_trade(
@@ -521,11 +1266,23 @@ class AsyncYellowChanger():
         sbpBank: Optional[str] = None,
         memo: Optional[str] = None,
         recipientName: Optional[str] = None,
-        testMode: Optional[int] = None
+        testMode: Optional[int] = None,
+        timeout: Optional[float] = None
     ):
         """
         Creates a new trade via the YellowChanger API.
+
+        :param timeout: Total time limit of the call in seconds, including retries
         """
+        if self.preflight is not None:
+            self.preflight.check(
+                send_name,
+                send_network,
+                get_name,
+                get_network,
+                send_value=send_value,
+                get_value=get_value
+            )
         body = {
             "send_name": send_name,
             "get_name": get_name,
@@ -555,20 +1312,30 @@ class AsyncYellowChanger():
             if testMode not in [0, 1]:
                 raise ValueError("testMode должен быть 0 или 1")
             body["testMode"] = testMode
-        response = await self.__fetch("POST", "trades/createTrade", body)
+        response = await self.__fetch("POST", "trades/createTrade", body, timeout=timeout)
         return response
 
-    async def cancel_trade(self, uniq_id: str):
+    async def cancel_trade(self, uniq_id: str, timeout: Optional[float] = None):
         """
         Cancels a exchange by its unique ID.
+
+        :param timeout: Total time limit of the call in seconds, including retries
         """
         body = {"uniq_id": uniq_id}
-        response = await self.__fetch("POST", "trades/cancelTrade", body)
+        response = await self.__fetch("POST", "trades/cancelTrade", body, timeout=timeout)
         return response
 
-    async def change_credentials(self, uniq_id: str, get_creds: str, sbpBank: Optional[str] = None):
+    async def change_credentials(
+        self,
+        uniq_id: str,
+        get_creds: str,
+        sbpBank: Optional[str] = None,
+        timeout: Optional[float] = None
+    ):
         """
         Changes the receiving credentials for a trade.
+
+        :param timeout: Total time limit of the call in seconds, including retries
         """
         body = {"uniq_id": str(uniq_id), "get_creds": str(get_creds)}
         if sbpBank:
@@ -576,7 +1343,7 @@ class AsyncYellowChanger():
                 body["sbpBank"] = str(sbpBank)
             else:
                 raise UnsupportedBank
-        response = await self.__fetch("POST", "trades/changeCredentials", body)
+        response = await self.__fetch("POST", "trades/changeCredentials", body, timeout=timeout)
         return response
 
     async def emulate_payment(
@@ -585,10 +1352,13 @@ class AsyncYellowChanger():
         paidAmount: str,
         withdrawStatus: str,
         depositStatus: str,
-        isInvalidRequisites: int
+        isInvalidRequisites: int,
+        timeout: Optional[float] = None
     ):
         """
         Emulates a payment for a trade by its unique ID.
+
+        :param timeout: Total time limit of the call in seconds, including retries
         """
         body = {
             "uniqId": uniq_id,
@@ -597,5 +1367,5 @@ class AsyncYellowChanger():
             "depositStatus": depositStatus,
             "isInvalidRequisites": isInvalidRequisites
         }
-        response = await self.__fetch("POST", "trades/emulatePayment", body)
+        response = await self.__fetch("POST", "trades/emulatePayment", body, timeout=timeout)
         return response